@@ -1,8 +1,12 @@
 from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QInputDialog
-import sys
+import logging
 import os
-import json
-from main_page_app2 import MainApp  # Import the main app directly
+import sys
+from data_lock import json_lock, read_json, write_json
+from main_page_app2 import MainApp, get_app_directory  # Import the main app directly
+
+# Where user data was kept before it moved to the app directory, relative to the working directory
+LEGACY_USER_DATA_FILE = "user_data.json"
 
 
 class LoginSignupApp(QWidget):
@@ -46,33 +50,49 @@ class LoginSignupApp(QWidget):
         # Set layout
         self.setLayout(self.layout)
 
-        # Storage for users
-        self.user_data_file = "user_data.json"
+        # Storage for users, shared by every instance whatever directory it was started from
+        self.user_data_file = os.path.join(get_app_directory(), "user_data.json")
+        self.migrate_user_data()
         self.load_user_data()
 
+    def migrate_user_data(self):
+        """
+        Move accounts from a user data file in the working directory, where
+        older versions kept it, into the app directory. Accounts already in the
+        app directory win. The old file is renamed so this happens only once.
+        """
+        if not os.path.exists(LEGACY_USER_DATA_FILE) or \
+                os.path.abspath(LEGACY_USER_DATA_FILE) == os.path.abspath(self.user_data_file):
+            return
+        with json_lock(self.user_data_file):
+            if not os.path.exists(LEGACY_USER_DATA_FILE):
+                return  # Migrated meanwhile by another instance
+            users = read_json(LEGACY_USER_DATA_FILE, {})
+            users.update(read_json(self.user_data_file, {}))
+            write_json(self.user_data_file, users)
+            os.replace(LEGACY_USER_DATA_FILE, f"{LEGACY_USER_DATA_FILE}.migrated")
+        logging.info(f"User data moved to {self.user_data_file}")
+
     def load_user_data(self):
         """Load user data from file."""
-        if not os.path.exists(self.user_data_file):
-            with open(self.user_data_file, 'w') as f:
-                json.dump({}, f)
-        with open(self.user_data_file, 'r') as f:
-            self.users = json.load(f)
+        self.users = read_json(self.user_data_file, {})
 
     def save_user_data(self):
-        """Save user data to file."""
-        with open(self.user_data_file, 'w') as f:
-            json.dump(self.users, f)
+        """Save user data to file. Call under json_lock, right after load_user_data."""
+        write_json(self.user_data_file, self.users)
 
     def login(self):
         """Handle login functionality."""
         username = self.username_input.text()
         password = self.password_input.text()
+        self.load_user_data()  # Pick up accounts changed by other instances
 
         if username in self.users and self.users[username] == password:
             QMessageBox.information(self, "Success", "Login successful!")
             self.hide()  # Hide the login window instead of closing it
             self.main_app = MainApp(username)  # Open the main application
             self.main_app.show()
+            self.main_app.start_prefetch()  # Warm the history in the background
         else:
             QMessageBox.warning(self, "Error", "Invalid username or password!")
 
@@ -81,26 +101,37 @@ class LoginSignupApp(QWidget):
         username = self.username_input.text()
         password = self.password_input.text()
 
-        if username in self.users:
-            QMessageBox.warning(self, "Error", "Username already exists!")
-        elif not username or not password:
+        if not username or not password:
             QMessageBox.warning(self, "Error", "Username and password cannot be empty!")
+            return
+
+        # Re-read under the lock, so signups from other instances are neither lost nor duplicated
+        with json_lock(self.user_data_file):
+            self.load_user_data()
+            exists = username in self.users
+            if not exists:
+                self.users[username] = password
+                self.save_user_data()
+
+        if exists:
+            QMessageBox.warning(self, "Error", "Username already exists!")
         else:
-            self.users[username] = password
-            self.save_user_data()
             QMessageBox.information(self, "Success", "Account created successfully!")
 
     def forgot_password(self):
         """Handle forgot password functionality."""
         username, ok = QInputDialog.getText(self, "Forgot Password", "Enter your username:")
         if ok and username:
+            self.load_user_data()
             if username in self.users:
                 # Ask for new password
                 new_password, ok = QInputDialog.getText(self, "Reset Password", "Enter new password:")
                 if ok and new_password:
-                    # Update password
-                    self.users[username] = new_password
-                    self.save_user_data()
+                    # Update password, keeping changes other instances made while the dialog was open
+                    with json_lock(self.user_data_file):
+                        self.load_user_data()
+                        self.users[username] = new_password
+                        self.save_user_data()
                     QMessageBox.information(self, "Success", "Password reset successful!")
                 else:
                     QMessageBox.warning(self, "Error", "Password cannot be empty!")
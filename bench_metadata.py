@@ -0,0 +1,126 @@
+"""
+Benchmark for header-only metadata extraction.
+
+Writes synthetic JPEG (EXIF + GPS) and PNG (text chunk) scans with several
+megabytes of image data each, then times read_image_metadata on them.
+Exits with a non-zero status if the mean cost reaches one millisecond.
+
+Usage: python bench_metadata.py [iterations]
+"""
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from scan_metadata import read_image_metadata
+
+IMAGE_DATA_SIZE = 4 * 1024 * 1024
+BUDGET_MS = 1.0
+
+
+def _ifd(entries, offset, extra_offset):
+    """Pack (tag, type, count, payload) entries as a little-endian IFD starting at offset."""
+    data = struct.pack('<H', len(entries))
+    extra = b""
+    for tag, field_type, count, payload in entries:
+        if len(payload) <= 4:
+            data += struct.pack('<HHI', tag, field_type, count) + payload.ljust(4, b"\x00")
+        else:
+            data += struct.pack('<HHII', tag, field_type, count, extra_offset + len(extra))
+            extra += payload
+    return data + struct.pack('<I', 0), extra
+
+
+def _rationals(*values):
+    return b"".join(struct.pack('<II', int(v * 100), 100) for v in values)
+
+
+def build_exif():
+    """Build an EXIF block with camera, capture time and GPS position."""
+    ifd0_offset = 8
+    ifd0_size = 2 + 5 * 12 + 4
+    ifd0_entries = [
+        (0x010F, 2, 6, b"Canon\x00"),
+        (0x0110, 2, 9, b"EOS 250D\x00"),
+        (0x0132, 2, 20, b"2024:05:01 10:00:00\x00"),
+        (0x8769, 4, 1, b""),  # Filled below
+        (0x8825, 4, 1, b""),
+    ]
+    # Lay out: header, IFD0, IFD0 extra, Exif IFD, GPS IFD
+    _, ifd0_extra = _ifd(ifd0_entries, ifd0_offset, ifd0_offset + ifd0_size)
+    exif_offset = ifd0_offset + ifd0_size + len(ifd0_extra)
+    exif_size = 2 + 12 + 4
+    exif_ifd, exif_extra = _ifd([(0x9003, 2, 20, b"2024:04:30 07:15:42\x00")], exif_offset, exif_offset + exif_size)
+    gps_offset = exif_offset + exif_size + len(exif_extra)
+    gps_size = 2 + 4 * 12 + 4
+    gps_ifd, gps_extra = _ifd([
+        (0x0001, 2, 2, b"N\x00"),
+        (0x0002, 5, 3, _rationals(52, 5, 30)),
+        (0x0003, 2, 2, b"E\x00"),
+        (0x0004, 5, 3, _rationals(4, 18, 0)),
+    ], gps_offset, gps_offset + gps_size)
+    ifd0_entries[3] = (0x8769, 4, 1, struct.pack('<I', exif_offset))
+    ifd0_entries[4] = (0x8825, 4, 1, struct.pack('<I', gps_offset))
+    ifd0, ifd0_extra = _ifd(ifd0_entries, ifd0_offset, ifd0_offset + ifd0_size)
+    return b"II*\x00" + struct.pack('<I', ifd0_offset) + ifd0 + ifd0_extra + exif_ifd + exif_extra + gps_ifd + gps_extra
+
+
+def write_jpeg(path):
+    exif = b"Exif\x00\x00" + build_exif()
+    with open(path, 'wb') as f:
+        f.write(b"\xff\xd8")
+        f.write(b"\xff\xe0" + struct.pack('>H', 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+        f.write(b"\xff\xe1" + struct.pack('>H', len(exif) + 2) + exif)
+        f.write(b"\xff\xdb" + struct.pack('>H', 67) + bytes(65))  # Quantization table
+        f.write(b"\xff\xc0" + struct.pack('>HBHHB', 11, 8, 3000, 4000, 1) + b"\x01\x11\x00")
+        f.write(b"\xff\xda" + struct.pack('>H', 8) + b"\x01\x01\x00\x00\x3f\x00")
+        f.write(os.urandom(IMAGE_DATA_SIZE))
+        f.write(b"\xff\xd9")
+
+
+def write_png(path):
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack('>IIBBBBB', 4000, 3000, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"tEXt", b"Creation Time\x002024-05-01T10:00:00"))
+        f.write(chunk(b"IDAT", os.urandom(IMAGE_DATA_SIZE)))
+        f.write(chunk(b"IEND", b""))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        jpeg_path = os.path.join(tmp, "scan.jpg")
+        png_path = os.path.join(tmp, "scan.png")
+        write_jpeg(jpeg_path)
+        write_png(png_path)
+
+        jpeg_metadata = read_image_metadata(jpeg_path)
+        assert jpeg_metadata["capture_time"] == "2024-04-30T07:15:42", jpeg_metadata
+        assert jpeg_metadata["camera_model"] == "EOS 250D", jpeg_metadata
+        assert abs(jpeg_metadata["gps_latitude"] - 52.0916667) < 1e-6, jpeg_metadata
+        assert read_image_metadata(png_path)["capture_time"] == "2024-05-01T10:00:00"
+
+        failed = False
+        for label, path in (("JPEG", jpeg_path), ("PNG", png_path)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                read_image_metadata(path)
+            mean_ms = (time.perf_counter() - start) * 1000 / iterations
+            print(f"{label}: {mean_ms:.4f} ms per image over {iterations} runs "
+                  f"({IMAGE_DATA_SIZE // (1024 * 1024)} MB of image data each)")
+            failed = failed or mean_ms >= BUDGET_MS
+
+    if failed:
+        print(f"FAIL: header-only extraction exceeded {BUDGET_MS} ms per image")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for video frame import.
+
+Synthesizes a 720p clip with a new sharp pattern every second and some motion
+in between, then imports it with each sampling mode, twice, into the same
+history. Checks that the second import adds its frames next to the first
+instead of overwriting them, and that every yielded frame is on disk.
+Exits with a non-zero status if an import runs slower than real time.
+
+Usage: python bench_video.py [seconds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from video_scan import _load_cv2, import_video
+
+WIDTH, HEIGHT = 1280, 720
+FPS = 30
+BLOCK = 16  # Size of the squares of the pattern, in pixels
+MIN_SPEED = 1.0  # Times real time
+
+
+def write_clip(cv2, path, seconds):
+    """Write a clip whose pattern changes every second and moves in between."""
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    if not writer.isOpened():
+        raise OSError(f"Cannot write test clip: {path}")
+    try:
+        for second in range(seconds):
+            # Each second uses another quarter of the brightness range, so it is a new scene
+            low = 64 * (second % 4)
+            blocks = rng.integers(low, low + 64, (HEIGHT // BLOCK, WIDTH // BLOCK, 3), dtype=np.uint8)
+            pattern = np.kron(blocks, np.ones((BLOCK, BLOCK, 1), dtype=np.uint8))
+            for n in range(FPS):
+                writer.write(np.roll(pattern, 4 * n, axis=1))
+    finally:
+        writer.release()
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    cv2 = _load_cv2()
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "clip.mp4")
+        write_clip(cv2, video_path, seconds)
+
+        for label, sampling in (("1 frame per second", {"sample_fps": 1.0}),
+                                ("On scene change", {"scene_change": True})):
+            history_folder = os.path.join(tmp, label.replace(" ", "_"))
+            frame_paths = []
+            for run in (1, 2):
+                start = time.perf_counter()
+                imported = [frame_path for frame_path, _, _, _ in import_video(
+                    video_path, history_folder, **sampling)]
+                elapsed = time.perf_counter() - start
+                frame_paths.extend(imported)
+                speed = seconds / elapsed
+                print(f"{label}, import {run}: {len(imported)} frame(s) from {seconds} s of "
+                      f"{WIDTH}x{HEIGHT} video in {elapsed:.2f} s ({speed:.1f}x real time)")
+                failed = failed or speed < MIN_SPEED
+
+            group_path = os.path.join(history_folder, "clip")
+            on_disk = {os.path.join(group_path, name) for name in os.listdir(group_path)
+                       if name.endswith(".jpg")}
+            if len(set(frame_paths)) != len(frame_paths) or on_disk != set(frame_paths):
+                print(f"FAIL: {len(frame_paths)} frame(s) imported, {len(on_disk)} on disk")
+                failed = True
+
+    if failed:
+        print(f"FAIL: video import slower than {MIN_SPEED:g}x real time or lost frames")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
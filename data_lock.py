@@ -0,0 +1,173 @@
+"""
+Coordination between several app instances sharing one data directory.
+
+Writers hold advisory locks (fcntl on POSIX, msvcrt on Windows) on small
+lock files next to the data they change, re-read shared JSON files under the
+lock before applying their change, and stamp a per-user change marker so the
+other instances can refresh their open views.
+"""
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Hidden lock file kept in each history folder
+LOCK_FILE_NAME = ".lock"
+
+# Identifies this process in change markers, so it can ignore its own changes
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+# Instances remembered in a change marker; older ones have long exited
+MAX_MARKED_INSTANCES = 32
+
+_held = threading.local()
+
+
+def _acquire(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after about 10 seconds
+            return
+        except OSError:
+            continue
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """
+    Hold an exclusive advisory lock on lock_path, creating the file if needed.
+    Blocks other processes and other threads; nested use in one thread is fine.
+    """
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = {}
+    key = os.path.abspath(lock_path)
+    if key in held:
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    with open(lock_path, 'a+b') as f:
+        _acquire(f)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            del held[key]
+            _release(f)
+
+
+def folder_lock(folder):
+    """Lock the files of one history folder (scans, sidecars and proxies)."""
+    return file_lock(os.path.join(folder, LOCK_FILE_NAME))
+
+
+@contextlib.contextmanager
+def scan_folder_lock(folder):
+    """
+    Lock a folder of scans for a change, first checking under the lock of its
+    parent that it was not deleted. Raises FileNotFoundError if it was.
+    """
+    with folder_lock(os.path.dirname(os.path.abspath(folder))):
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"The folder no longer exists: {folder}")
+        with folder_lock(folder):
+            yield
+
+
+def json_lock(path):
+    """Lock a shared JSON file for a read-modify-write."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return file_lock(f"{path}.lock")
+
+
+def read_json(path, default):
+    """Load a JSON file, or return default if it does not exist yet."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path, data):
+    """Write a JSON file atomically, so readers never see it half written."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def update_json(path, update, default=None):
+    """
+    Apply update(data) to a shared JSON file under its lock, re-reading it
+    first so changes made meanwhile by other instances are kept.
+    Returns the data as written.
+    """
+    with json_lock(path):
+        data = read_json(path, {} if default is None else default)
+        update(data)
+        write_json(path, data)
+    return data
+
+
+def change_marker_for(history_folder):
+    """The marker lives next to the history folder, so writing it does not touch the folder."""
+    return f"{history_folder}.changed"
+
+
+def notify_change(history_folder):
+    """
+    Tell the other instances that this history changed. The marker keeps the
+    time of the last change of each instance, so a change is not hidden by
+    another instance writing right after it.
+    """
+    marker = change_marker_for(history_folder)
+    with json_lock(marker):
+        changes = read_change_marker(history_folder)
+        changes[INSTANCE_ID] = time.time_ns()
+        for instance in sorted(changes, key=changes.get)[:-MAX_MARKED_INSTANCES]:
+            del changes[instance]
+        write_json(marker, changes)
+
+
+def read_change_marker(history_folder):
+    """Return {instance id: time of its last change} for a history."""
+    try:
+        return read_json(change_marker_for(history_folder), {})
+    except ValueError:  # Marker from an older version
+        return {}
+
+
+def external_changes(history_folder):
+    """
+    Return {instance id: time of its last change} for the other instances.
+    Compare it as a whole to what was seen before, rather than the times to
+    each other, since other hosts' clocks may disagree.
+    """
+    changes = read_change_marker(history_folder)
+    changes.pop(INSTANCE_ID, None)
+    return changes
@@ -0,0 +1,421 @@
+"""
+Streaming export of scan history to a zip or tar archive with a manifest.
+
+Scans are streamed into the archive one at a time, together with their
+description files, while a manifest (CSV or JSONL, optionally converted to
+Parquet at the end) lists each scan's name, description and metadata.
+Files are read ahead by a few worker threads; memory and temporary space stay
+bounded by the read-ahead window, whatever the size of the export.
+
+After each scan a journal line records where the archive ends and the zip
+entry headers written, so an interrupted export, even a killed one, can be
+resumed: the archive is cut back to the last complete scan and the export
+continues from there. A zip interrupted this way has no central directory
+and cannot be opened as it is; resuming rebuilds the directory from the
+journal, and only a finished export is a complete archive. The journal also
+records the selection and manifest format, which a resumed export reuses.
+
+Scans deleted or renamed by another instance while the export runs are
+skipped with a warning.
+
+Usage:
+    python history_export.py HISTORY_FOLDER OUTPUT.zip|OUTPUT.tar
+        [--groups NAME ...] [--scans PATH ...] [--manifest csv|jsonl] [--parquet] [--resume]
+
+--groups "" selects the individual scans outside any group. With --resume,
+the selection and manifest options of the interrupted export are used.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import sys
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_metadata import load_metadata
+
+ARCHIVE_FORMATS = (".zip", ".tar")
+MANIFEST_FORMATS = ("csv", "jsonl")
+MANIFEST_FIELDS = (
+    "archive_name", "group", "name", "description", "size",
+    "capture_time", "camera_make", "camera_model", "gps_latitude", "gps_longitude"
+)
+
+# Files up to this size are read ahead by the workers; larger ones are streamed by the writer
+READ_AHEAD_LIMIT = 8 * 1024 * 1024
+READ_AHEAD_FILES = 4
+CHUNK_SIZE = 1024 * 1024
+PARQUET_BATCH_ROWS = 10000
+
+
+def manifest_path_for(output_path, manifest_format):
+    return f"{os.path.splitext(output_path)[0]}.manifest.{manifest_format}"
+
+
+def journal_path_for(output_path):
+    return f"{output_path}.journal"
+
+
+def iter_scans(history_folder, groups=None, scans=None):
+    """
+    Yield (group, image_path) for the selected scans in a stable order.
+    With neither groups nor scans given, the whole history is selected.
+    A scan selected both directly and through its group is yielded once.
+    """
+    seen = set()
+    if scans:
+        for image_path in scans:
+            if os.path.abspath(image_path) in seen:
+                continue
+            seen.add(os.path.abspath(image_path))
+            group = os.path.relpath(os.path.dirname(image_path), history_folder)
+            yield ("" if group == "." else group), image_path
+    if groups is None and scans:
+        return
+
+    for root, dirs, files in os.walk(history_folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        group = os.path.relpath(root, history_folder)
+        group = "" if group == "." else group
+        if groups is not None and group not in groups:
+            continue
+        for file in sorted(files):
+            image_path = os.path.join(root, file)
+            if file.lower().endswith(('.png', '.jpg', '.jpeg')) and os.path.abspath(image_path) not in seen:
+                yield group, image_path
+
+
+def _read_scan(group, image_path):
+    """
+    Read everything the writer needs for one scan. Runs in the read-ahead workers.
+    Returns None if the scan was deleted or renamed since it was listed.
+    """
+    try:
+        return _read_scan_files(group, image_path)
+    except FileNotFoundError:
+        logging.warning(f"Skipped a scan deleted or renamed during the export: {image_path}")
+        return None
+
+
+def _read_scan_files(group, image_path):
+    stat = os.stat(image_path)
+    name = os.path.basename(image_path)
+    archive_name = f"{group}/{name}" if group else name
+
+    description = ""
+    desc_file = f"{image_path}.txt"
+    if os.path.exists(desc_file):
+        with open(desc_file, 'r') as f:
+            description = f.read()
+
+    data = None
+    if stat.st_size <= READ_AHEAD_LIMIT:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+
+    metadata = load_metadata(image_path)
+    row = {
+        "archive_name": archive_name, "group": group, "name": os.path.splitext(name)[0],
+        "description": description, "size": stat.st_size,
+    }
+    row.update({field: metadata.get(field) for field in MANIFEST_FIELDS if field not in row})
+    return row, image_path, stat.st_mtime, data
+
+
+def _read_ahead(selected, workers):
+    """Yield _read_scan results (None for skipped scans) in order, keeping at most READ_AHEAD_FILES in flight."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for group, image_path in selected:
+            pending.append(executor.submit(_read_scan, group, image_path))
+            if len(pending) >= READ_AHEAD_FILES:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class _ArchiveWriter:
+    """Append-only writer for zip or tar archives that can reopen at a given offset."""
+
+    def __init__(self, output_path, offset, zip_entries):
+        self.is_zip = output_path.lower().endswith(".zip")
+        self.file = open(output_path, 'r+b' if os.path.exists(output_path) else 'w+b')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        if self.is_zip:
+            self.archive = zipfile.ZipFile(self.file, 'w', allowZip64=True)
+            # Re-register the entries already in the file so the central directory covers them
+            for fields in zip_entries:
+                zinfo = _zipinfo_from_json(fields)
+                self.archive.filelist.append(zinfo)
+                self.archive.NameToInfo[zinfo.filename] = zinfo
+        else:
+            self.archive = tarfile.open(fileobj=self.file, mode='w', format=tarfile.PAX_FORMAT)
+
+    def tell(self):
+        return self.archive.fp.tell() if self.is_zip else self.archive.offset
+
+    def flush(self):
+        """Push written members to the OS so that a journaled offset is never ahead of the file."""
+        self.file.flush()
+
+    def add(self, archive_name, mtime, data=None, source_path=None, compress=False):
+        """Add one member from bytes or, chunk by chunk, from a file. Returns its zip entry (or None)."""
+        if self.is_zip:
+            # Zip timestamps cannot go before 1980
+            date_time = datetime.datetime.fromtimestamp(max(mtime, 315532800)).timetuple()[:6]
+            zinfo = zipfile.ZipInfo(archive_name, date_time)
+            zinfo.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            zinfo.external_attr = 0o644 << 16
+            if data is not None:
+                self.archive.writestr(zinfo, data)
+            else:
+                with open(source_path, 'rb') as src, self.archive.open(zinfo, 'w', force_zip64=True) as dst:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dst.write(chunk)
+            return zinfo
+        tarinfo = tarfile.TarInfo(archive_name)
+        tarinfo.mtime = mtime
+        tarinfo.mode = 0o644
+        if data is not None:
+            tarinfo.size = len(data)
+            self.archive.addfile(tarinfo, io.BytesIO(data))
+        else:
+            tarinfo.size = os.path.getsize(source_path)
+            with open(source_path, 'rb') as src:
+                self.archive.addfile(tarinfo, src)
+        return None
+
+    def close(self):
+        self.archive.close()
+        self.file.close()
+
+
+def _zipinfo_to_json(zinfo):
+    fields = {}
+    for slot in zipfile.ZipInfo.__slots__:
+        if hasattr(zinfo, slot):
+            value = getattr(zinfo, slot)
+            fields[slot] = {"hex": value.hex()} if isinstance(value, bytes) else value
+    return fields
+
+
+def _zipinfo_from_json(fields):
+    zinfo = zipfile.ZipInfo(fields["filename"])
+    for slot, value in fields.items():
+        if isinstance(value, dict):
+            value = bytes.fromhex(value["hex"])
+        elif isinstance(value, list):
+            value = tuple(value)
+        setattr(zinfo, slot, value)
+    return zinfo
+
+
+def _load_journal(journal_path):
+    """
+    Return (export settings or None, archive end offset, set of exported scans,
+    zip entries) from an export journal.
+    """
+    settings, offset, done, zip_entries = None, 0, set(), []
+    with open(journal_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Partially written last line
+            if "settings" in record:
+                settings = record["settings"]
+                continue
+            offset = record["end"]
+            done.add(record["scan"])
+            zip_entries.extend(record["zip_entries"])
+    return settings, offset, done, zip_entries
+
+
+def export_settings(output_path):
+    """
+    Return the settings (groups, scans, manifest_format, parquet) of an
+    interrupted export to output_path, {} if its journal predates them, or
+    None if there is no export to resume.
+    """
+    journal_path = journal_path_for(output_path)
+    if not os.path.exists(journal_path):
+        return None
+    return _load_journal(journal_path)[0] or {}
+
+
+def _rewrite_manifest(manifest_path, manifest_format, done):
+    """Keep only the manifest rows of scans that are complete in the archive."""
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"Cannot resume: the manifest {manifest_path} is missing")
+    temp_path = f"{manifest_path}.tmp"
+    with open(manifest_path, 'r', newline='') as src, open(temp_path, 'w', newline='') as dst:
+        if manifest_format == "csv":
+            writer = csv.DictWriter(dst, MANIFEST_FIELDS)
+            writer.writeheader()
+            for row in csv.DictReader(src):
+                if row["archive_name"] in done:
+                    writer.writerow(row)
+        else:
+            for line in src:
+                try:
+                    if json.loads(line)["archive_name"] in done:
+                        dst.write(line)
+                except ValueError:
+                    break
+    os.replace(temp_path, manifest_path)
+
+
+def _write_parquet(manifest_path, manifest_format):
+    """Convert the finished manifest to Parquet in batches."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (field, pa.int64() if field == "size" else pa.float64() if field.startswith("gps_") else pa.string())
+        for field in MANIFEST_FIELDS
+    ])
+
+    def batches():
+        with open(manifest_path, 'r', newline='') as f:
+            rows = csv.DictReader(f) if manifest_format == "csv" else (json.loads(line) for line in f)
+            batch = []
+            for row in rows:
+                for field in ("size", "gps_latitude", "gps_longitude"):
+                    value = row[field]
+                    row[field] = None if value in (None, "") else (int if field == "size" else float)(value)
+                batch.append(row)
+                if len(batch) >= PARQUET_BATCH_ROWS:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    parquet_path = f"{os.path.splitext(manifest_path)[0]}.parquet"
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        for batch in batches():
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return parquet_path
+
+
+def export_history(history_folder, output_path, groups=None, scans=None, manifest_format="csv",
+                   parquet=False, resume=False, workers=READ_AHEAD_FILES):
+    """
+    Export the selected scans (all of them by default) to output_path.
+    Yields the archive name of each scan as it is written; close the
+    generator to interrupt the export in a resumable state. A resumed export
+    uses the selection and manifest options recorded when it was started.
+    """
+    journal_path = journal_path_for(output_path)
+    offset, done, zip_entries = 0, set(), []
+    if resume:
+        if not os.path.exists(journal_path):
+            raise ValueError(f"Nothing to resume: no export journal for {output_path}")
+        settings, offset, done, zip_entries = _load_journal(journal_path)
+        if settings:
+            groups, scans = settings["groups"], settings["scans"]
+            manifest_format, parquet = settings["manifest_format"], settings["parquet"]
+
+    if not output_path.lower().endswith(ARCHIVE_FORMATS):
+        raise ValueError(f"Unsupported archive type: {output_path} (use {' or '.join(ARCHIVE_FORMATS)})")
+    if manifest_format not in MANIFEST_FORMATS:
+        raise ValueError(f"Unsupported manifest format: {manifest_format}")
+    if parquet:
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet manifests require pyarrow. Install it with: pip install pyarrow")
+
+    manifest_path = manifest_path_for(output_path, manifest_format)
+    if resume:
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < offset:
+            raise ValueError(f"Cannot resume: {output_path} is missing or shorter than its journal")
+        _rewrite_manifest(manifest_path, manifest_format, done)
+        logging.info(f"Resuming export to {output_path}: {len(done)} scan(s) already exported.")
+    else:
+        with open(journal_path, 'w') as journal:
+            journal.write(json.dumps({"settings": {
+                "groups": groups, "scans": scans, "manifest_format": manifest_format, "parquet": parquet,
+            }}) + "\n")
+
+    selected = (
+        (group, image_path) for group, image_path in iter_scans(history_folder, groups, scans)
+        if (f"{group}/{os.path.basename(image_path)}" if group else os.path.basename(image_path)) not in done
+    )
+
+    writer = _ArchiveWriter(output_path, offset, zip_entries)
+    try:
+        with open(manifest_path, 'a' if resume else 'w', newline='') as manifest, \
+                open(journal_path, 'a') as journal:
+            csv_writer = csv.DictWriter(manifest, MANIFEST_FIELDS) if manifest_format == "csv" else None
+            if csv_writer and not resume:
+                csv_writer.writeheader()
+
+            for scan in _read_ahead(selected, workers):
+                if scan is None:
+                    continue
+                row, image_path, mtime, data = scan
+                try:
+                    image_entry = writer.add(row["archive_name"], mtime, data=data, source_path=image_path)
+                except FileNotFoundError:
+                    # A large scan, streamed from disk, was deleted or renamed since it was read
+                    logging.warning(f"Skipped a scan deleted or renamed during the export: {image_path}")
+                    continue
+                entries = [
+                    image_entry,
+                    writer.add(
+                        f"{row['archive_name']}.txt", mtime, data=row["description"].encode('utf-8'), compress=True
+                    ),
+                ]
+                if csv_writer:
+                    csv_writer.writerow(row)
+                else:
+                    manifest.write(json.dumps(row) + "\n")
+                manifest.flush()
+                writer.flush()
+                journal.write(json.dumps({
+                    "scan": row["archive_name"], "end": writer.tell(),
+                    "zip_entries": [_zipinfo_to_json(zinfo) for zinfo in entries if zinfo is not None],
+                }) + "\n")
+                journal.flush()
+                yield row["archive_name"]
+    finally:
+        writer.close()
+
+    os.remove(journal_path)
+    if parquet:
+        logging.info(f"Parquet manifest written: {_write_parquet(manifest_path, manifest_format)}")
+    logging.info(f"Export finished: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export scan history to a zip or tar archive with a manifest.")
+    parser.add_argument("history_folder")
+    parser.add_argument("output", help="archive to write (.zip or .tar)")
+    parser.add_argument("--groups", nargs="*", help='groups to export ("" for individual scans)')
+    parser.add_argument("--scans", nargs="*", help="individual scan files to export")
+    parser.add_argument("--manifest", choices=MANIFEST_FORMATS, default="csv")
+    parser.add_argument("--parquet", action="store_true", help="also write the manifest as Parquet (needs pyarrow)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    count = 0
+    try:
+        for count, archive_name in enumerate(export_history(
+                args.history_folder, args.output, args.groups, args.scans,
+                args.manifest, args.parquet, args.resume), start=1):
+            logging.debug(f"Exported: {archive_name}")
+    except KeyboardInterrupt:
+        print(f"Interrupted after {count} scan(s); run again with --resume to continue.")
+        sys.exit(1)
+    print(f"Exported {count} scan(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
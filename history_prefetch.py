@@ -0,0 +1,210 @@
+"""
+Low-priority background prefetch of a user's history.
+
+Right after login, a worker thread warms the folder listings (with scan
+metadata) and the thumbnails of the most recent scans and the most recently
+used groups. The history views then read through the same caches. The
+worker pauses whenever foreground work is running and checks between every
+small unit of work, so it never holds up the user.
+"""
+import collections
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from scan_metadata import load_metadata
+from scan_proxies import PROXY_FOLDER_NAME, load_thumbnail
+
+THUMBNAIL_SIZE = 100
+
+# A listing taken within this long of the folder's mtime may have missed a change
+# made in the same timestamp tick (coarse on FAT, SMB and some other filesystems)
+RACY_LISTING_NS = 2_000_000_000
+
+# Aggressiveness level -> (recent scans per folder, recent groups, pause in seconds between items)
+PREFETCH_LEVELS = {
+    "Off": None,
+    "Low": (20, 2, 0.05),
+    "High": (100, 5, 0.0),
+}
+DEFAULT_PREFETCH_LEVEL = "Low"
+
+# One folder entry: name, full path, whether it is a group folder, mtime and scan metadata
+HistoryEntry = collections.namedtuple("HistoryEntry", "name path is_dir mtime_ns metadata")
+
+
+class HistoryPrefetcher:
+    """Caches of history listings and thumbnails, filled in the background and read by the views."""
+
+    def __init__(self, history_folder, level=DEFAULT_PREFETCH_LEVEL):
+        self.history_folder = history_folder
+        self.level = level if level in PREFETCH_LEVELS else DEFAULT_PREFETCH_LEVEL
+
+        self._lock = threading.Lock()
+        # Cache entries remember whether the prefetcher filled them, for the metrics
+        self._listings = {}  # folder -> (folder mtime_ns, [HistoryEntry], prefetched, listed at ns)
+        self._thumbnails = collections.OrderedDict()  # path -> (mtime_ns, QImage, prefetched), LRU first
+        self._thumbnail_limit = 100
+
+        self._idle = threading.Event()  # Set while no foreground work is running
+        self._idle.set()
+        self._foreground_depth = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Metrics: views and thumbnails shown, and how many of them came from prefetched data
+        self.views = 0
+        self.views_prefetched = 0
+        self.thumbnails_served = 0
+        self.thumbnails_prefetched = 0
+
+    def start(self):
+        """Start prefetching in the background, unless it is turned off or already running."""
+        settings = PREFETCH_LEVELS[self.level]
+        if settings is None or (self._thread and self._thread.is_alive()):
+            return
+        scans, groups, _ = settings
+        self._thumbnail_limit = scans * (1 + groups)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=settings, name="HistoryPrefetcher", daemon=True)
+        self._thread.start()
+        logging.info(f"History prefetch started ({self.level}).")
+
+    def stop(self):
+        """Stop the background worker after its current item."""
+        self._stop.set()
+
+    def set_level(self, level):
+        """Change how aggressively to prefetch and restart the worker with the new setting."""
+        self.stop()
+        if self._thread:
+            self._thread.join()
+        self.level = level
+        self.start()
+
+    @contextlib.contextmanager
+    def foreground(self):
+        """Context manager around foreground work; the worker waits until it is done."""
+        with self._lock:
+            self._foreground_depth += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground_depth -= 1
+                if not self._foreground_depth:
+                    self._idle.set()
+
+    def listing(self, folder, view=False):
+        """
+        Return the entries of a history folder, from the cache if the folder is
+        unchanged since it was listed. Views pass view=True, which counts them
+        in the metrics.
+
+        A listing taken too soon after the folder last changed is not reused:
+        another change within the same mtime tick would not alter the mtime.
+        """
+        return self._listing(folder, prefetching=False, view=view)
+
+    def _listing(self, folder, prefetching, view=False):
+        folder_mtime = os.stat(folder).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(folder)
+        prefetched = False
+        if cached is not None and cached[0] == folder_mtime and cached[3] - folder_mtime > RACY_LISTING_NS:
+            entries, prefetched = cached[1], cached[2]
+        else:
+            listed_at = time.time_ns()
+            entries = []
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if entry.name != PROXY_FOLDER_NAME:
+                            entries.append(HistoryEntry(entry.name, entry.path, True, entry.stat().st_mtime_ns, None))
+                    elif entry.name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                        entries.append(HistoryEntry(
+                            entry.name, entry.path, False, entry.stat().st_mtime_ns, load_metadata(entry.path)
+                        ))
+            with self._lock:
+                self._listings[folder] = (folder_mtime, entries, prefetching, listed_at)
+        if view:
+            self.views += 1
+            self.views_prefetched += prefetched
+        return entries
+
+    def thumbnail(self, image_path):
+        """Return the thumbnail of a scan as a QImage, decoding it now if it was not prefetched."""
+        mtime = os.stat(image_path).st_mtime_ns
+        with self._lock:
+            cached = self._thumbnails.get(image_path)
+            if cached is not None and cached[0] == mtime:
+                self._thumbnails.move_to_end(image_path)
+                self.thumbnails_served += 1
+                self.thumbnails_prefetched += cached[2]
+                return cached[1]
+        image = load_thumbnail(image_path, THUMBNAIL_SIZE)
+        self._store_thumbnail(image_path, mtime, image, prefetched=False)
+        self.thumbnails_served += 1
+        return image
+
+    def metrics(self):
+        """Return a one-line summary of how much of the history views was served from prefetched data."""
+        return (
+            f"{self.views_prefetched} of {self.views} history view(s) and "
+            f"{self.thumbnails_prefetched} of {self.thumbnails_served} thumbnail(s) served from prefetched data"
+        )
+
+    def _store_thumbnail(self, image_path, mtime, image, prefetched):
+        with self._lock:
+            self._thumbnails[image_path] = (mtime, image, prefetched)
+            self._thumbnails.move_to_end(image_path)
+            while len(self._thumbnails) > self._thumbnail_limit:
+                self._thumbnails.popitem(last=False)
+
+    def _wait_turn(self, delay):
+        """Wait until no foreground work is running. Returns False once stopped."""
+        while not self._idle.wait(0.1):
+            if self._stop.is_set():
+                return False
+        if delay and self._stop.wait(delay):
+            return False
+        return not self._stop.is_set()
+
+    def _run(self, scans, groups, delay):
+        # Run below normal priority where threads can be niced individually
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+            except OSError:
+                pass
+        try:
+            if not self._wait_turn(0):
+                return
+            root_entries = self._listing(self.history_folder, prefetching=True)
+            folders = [(self.history_folder, root_entries)]
+            recent_groups = sorted((e for e in root_entries if e.is_dir), key=lambda e: e.mtime_ns, reverse=True)
+            for group in recent_groups[:groups]:
+                if not self._wait_turn(delay):
+                    return
+                folders.append((group.path, self._listing(group.path, prefetching=True)))
+
+            warmed = 0
+            for _, entries in folders:
+                recent_scans = sorted((e for e in entries if not e.is_dir), key=lambda e: e.mtime_ns, reverse=True)
+                for entry in recent_scans[:scans]:
+                    if not self._wait_turn(delay):
+                        return
+                    with self._lock:
+                        cached = self._thumbnails.get(entry.path)
+                    if cached is None or cached[0] != entry.mtime_ns:
+                        self._store_thumbnail(
+                            entry.path, entry.mtime_ns, load_thumbnail(entry.path, THUMBNAIL_SIZE), prefetched=True
+                        )
+                        warmed += 1
+            logging.info(f"History prefetch done: {len(folders)} folder(s), {warmed} thumbnail(s).")
+        except Exception as e:
+            logging.error(f"Exception in history prefetch: {e}")
@@ -0,0 +1,182 @@
+"""
+Incrementally maintained statistics of a user's scan history.
+
+Scan counts and storage are aggregated per group and per ingest day, and
+updated on every ingest, rename and delete, so reading them never walks the
+history folder. rebuild() recomputes everything from disk for verification.
+Every update re-reads the file under its lock first, so several app
+instances can share one statistics file without losing each other's counts.
+
+Usage: python history_stats.py <history folder> <statistics file>
+(rebuilds the statistics file and prints the totals)
+"""
+import contextlib
+import datetime
+import json
+import os
+import sys
+
+from data_lock import json_lock
+from scan_proxies import PROXY_FOLDER_NAME
+
+# Number of ingest batches kept for the throughput history
+MAX_INGEST_RECORDS = 500
+
+
+class HistoryStats:
+    """
+    Per-group and per-day scan counts, image storage and ingest throughput.
+    The group of individual scans is "". Days are the ingest (modification) date.
+    """
+
+    def __init__(self, history_folder, stats_file):
+        self.history_folder = history_folder
+        self.stats_file = stats_file
+        self.groups = {}
+        self.ingests = []
+        if not self.load():
+            self.rebuild()
+
+    def load(self):
+        """Load the saved statistics. Returns False if there are none."""
+        try:
+            with open(self.stats_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.groups = data.get("groups", {})
+        self.ingests = data.get("ingests", [])
+        return True
+
+    def save(self):
+        """Write the statistics atomically."""
+        os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+        temp_file = f"{self.stats_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump({"groups": self.groups, "ingests": self.ingests}, f)
+        os.replace(temp_file, self.stats_file)
+
+    @contextlib.contextmanager
+    def _updating(self):
+        """Re-read the statistics under their lock, let the caller change them, then save."""
+        with json_lock(self.stats_file):
+            self.load()
+            yield
+            self.save()
+
+    def rebuild(self):
+        """Recompute the statistics from the files on disk. Returns True if they had drifted."""
+        # Walk under the lock, so no other instance's update lands in between
+        with self._updating():
+            groups = {"": self._empty_entry()}
+            for root, dirs, files in os.walk(self.history_folder):
+                dirs[:] = [d for d in dirs if d != PROXY_FOLDER_NAME]
+                if root != self.history_folder:
+                    self._group_entry(groups, self._group_of_folder(root))
+                for file in files:
+                    if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                        path = os.path.join(root, file)
+                        try:
+                            self._add(groups, path, os.stat(path))
+                        except FileNotFoundError:
+                            pass  # Deleted by another instance during the walk
+            drifted = groups != self.groups
+            self.groups = groups
+        return drifted
+
+    def _group_of_folder(self, folder):
+        group = os.path.relpath(folder, self.history_folder)
+        return "" if group == "." else group
+
+    def _group_of(self, path):
+        return self._group_of_folder(os.path.dirname(path))
+
+    @staticmethod
+    def _day_of(stat):
+        return datetime.date.fromtimestamp(stat.st_mtime).isoformat()
+
+    @staticmethod
+    def _empty_entry():
+        return {"count": 0, "bytes": 0, "days": {}}
+
+    def _group_entry(self, groups, group):
+        return groups.setdefault(group, self._empty_entry())
+
+    def _add(self, groups, path, stat, sign=1):
+        entry = self._group_entry(groups, self._group_of(path))
+        day = self._day_of(stat)
+        entry["count"] += sign
+        entry["bytes"] += sign * stat.st_size
+        entry["days"][day] = entry["days"].get(day, 0) + sign
+        if not entry["days"][day]:
+            del entry["days"][day]
+
+    def record_ingest(self, paths, seconds, stats=None):
+        """
+        Count newly ingested scans and the throughput of their batch. Pass the
+        stat of each scan taken when it was added, if another instance may
+        have renamed or deleted it since.
+        """
+        if stats is None:
+            stats = [os.stat(path) for path in paths]
+        with self._updating():
+            for path, stat in zip(paths, stats):
+                self._add(self.groups, path, stat)
+            if paths:
+                self.ingests.append([
+                    datetime.datetime.now().isoformat(timespec='seconds'), len(paths),
+                    sum(stat.st_size for stat in stats), round(seconds, 3)
+                ])
+                del self.ingests[:-MAX_INGEST_RECORDS]
+
+    def record_group_created(self, group_path):
+        """Make a new, empty group show up in the statistics."""
+        with self._updating():
+            self._group_entry(self.groups, self._group_of_folder(group_path))
+
+    def record_renamed(self, old_path, new_path):
+        """Move a renamed scan between groups if the rename changed its folder."""
+        if self._group_of(old_path) != self._group_of(new_path):
+            stat = os.stat(new_path)
+            with self._updating():
+                self._add(self.groups, old_path, stat, sign=-1)
+                self._add(self.groups, new_path, stat)
+
+    def record_scan_removed(self, path, stat):
+        """Uncount a deleted scan, given its stat taken before deletion."""
+        with self._updating():
+            self._add(self.groups, path, stat, sign=-1)
+
+    def record_group_removed(self, group_path):
+        """Drop a deleted group with all of its scans."""
+        with self._updating():
+            self.groups.pop(self._group_of_folder(group_path), None)
+
+    def record_cleared(self):
+        """Forget every scan and group after the whole history was deleted."""
+        with self._updating():
+            self.groups = {"": self._empty_entry()}
+
+    def total_count(self):
+        return sum(entry["count"] for entry in self.groups.values())
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.groups.values())
+
+    def counts_by_day(self):
+        """Return {day: scan count} over all groups, sorted by day."""
+        days = {}
+        for entry in self.groups.values():
+            for day, count in entry["days"].items():
+                days[day] = days.get(day, 0) + count
+        return dict(sorted(days.items()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__.strip())
+        sys.exit(2)
+    stats = HistoryStats(sys.argv[1], sys.argv[2])
+    drifted = stats.rebuild()
+    print(f"{stats.total_count()} scan(s), {stats.total_bytes()} byte(s) in {len(stats.groups)} group(s)")
+    print("Statistics had drifted from disk and were corrected." if drifted else "Statistics matched disk.")
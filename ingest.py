@@ -0,0 +1,84 @@
+"""
+Ingest workers that copy scans into the user's history folder.
+"""
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from scan_files import add_scan
+from scan_metadata import read_image_metadata
+from scan_proxies import PROXY_SIZES, generate_proxies
+
+# Number of images ingested in parallel
+INGEST_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class IngestError(Exception):
+    """Some images of a batch could not be ingested; the rest were."""
+
+    def __init__(self, failures):
+        super().__init__(f"{len(failures)} image(s) could not be ingested")
+        self.failures = failures  # [(source path, exception)]
+
+
+def ingest_image(file_path, target_folder, proxy_sizes=PROXY_SIZES):
+    """
+    Copy one image into the target folder, create its description and
+    metadata sidecars and generate its proxies. Returns the destination path
+    and its stat as of when it was added.
+    """
+    metadata = read_image_metadata(file_path)
+
+    file_name = os.path.basename(file_path)
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    # Copy the file to the target directory under a hidden temporary name first
+    fd, temp_path = tempfile.mkstemp(prefix=".ingest-", suffix=".tmp", dir=target_folder)
+    os.close(fd)
+    try:
+        shutil.copy(file_path, temp_path)
+        # Then add it under a free name, together with its description and metadata
+        destination_path, stat = add_scan(
+            target_folder, f"{timestamp}_{file_name}", temp_path, "Enter description here...", metadata
+        )
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logging.info(f"Image copied to: {destination_path}")
+    logging.debug(f"Description and metadata stored for: {os.path.basename(destination_path)}")
+
+    # A missing proxy only costs readers a full decode, so it must not fail the ingest
+    try:
+        generate_proxies(destination_path, proxy_sizes)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Failed to generate proxies for {destination_path}: {e}")
+    return destination_path, stat
+
+
+def ingest_images(file_paths, target_folder, proxy_sizes=PROXY_SIZES):
+    """
+    Ingest several images in parallel worker threads.
+    Yields (destination path, stat) as soon as each image is done. A failing
+    image does not stop the others; once all are done, IngestError lists
+    the failures.
+    """
+    failures = []
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        futures = {
+            executor.submit(ingest_image, file_path, target_folder, proxy_sizes): file_path
+            for file_path in file_paths
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Failed to ingest {futures[future]}: {e}")
+                failures.append((futures[future], e))
+                continue
+            yield result
+    if failures:
+        raise IngestError(failures)
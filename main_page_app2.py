@@ -2,15 +2,31 @@ import logging
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog,
     QHBoxLayout, QMessageBox, QTextEdit, QScrollArea, QLineEdit, QGridLayout,
-    QFrame, QInputDialog, QListWidget, QListWidgetItem, QProgressBar
+    QFrame, QInputDialog, QListWidget, QListWidgetItem, QProgressBar, QComboBox,
+    QCheckBox, QTableWidget, QTableWidgetItem, QTableView, QAbstractItemView
+)
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import (
+    Qt, QAbstractTableModel, QFileSystemWatcher, QItemSelectionModel, QModelIndex, QSize, QTimer, pyqtSignal
 )
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
 import os
 import shutil
-import datetime
 import sys
+import time
+import json
 import appdirs  # Ensure this is installed via pip
+from concurrent.futures import ThreadPoolExecutor
+
+from data_lock import (
+    LOCK_FILE_NAME, external_changes, folder_lock, notify_change, update_json
+)
+from history_export import MANIFEST_FORMATS, export_history, export_settings, iter_scans
+from history_prefetch import DEFAULT_PREFETCH_LEVEL, PREFETCH_LEVELS, THUMBNAIL_SIZE, HistoryPrefetcher
+from history_stats import HistoryStats
+from ingest import IngestError, ingest_images
+from scan_files import ScanChangedError, delete_group, delete_scan, read_description, save_scan
+from video_scan import DEFAULT_SAMPLE_FPS, VIDEO_EXTENSIONS, import_video
+from scan_proxies import PROXY_SIZES, regenerate_proxies
 
 def get_app_directory():
     """
@@ -62,6 +78,17 @@ class MainApp(QWidget):
         self.stop_group_button.setEnabled(False)
         top_bar.addWidget(self.stop_group_button)
 
+        # Statistics button
+        self.statistics_button = QPushButton("Statistics")
+        self.statistics_button.clicked.connect(self.view_statistics)
+        top_bar.addWidget(self.statistics_button)
+
+        # Prefetch setting
+        top_bar.addWidget(QLabel("Prefetch:"))
+        self.prefetch_combo = QComboBox()
+        self.prefetch_combo.addItems(PREFETCH_LEVELS)
+        top_bar.addWidget(self.prefetch_combo)
+
         self.layout.addLayout(top_bar)
 
         # Scan options
@@ -72,11 +99,16 @@ class MainApp(QWidget):
         self.quick_scan_button.clicked.connect(self.quick_scan)
         self.layout.addWidget(self.quick_scan_button)
 
+        self.video_scan_button = QPushButton("Video Scan")
+        self.video_scan_button.clicked.connect(self.video_scan)
+        self.layout.addWidget(self.video_scan_button)
+
         # Enable drag-and-drop
         self.setAcceptDrops(True)
 
-        # Initialize a list to store dragged image paths
+        # Initialize lists to store dragged image and video paths
         self.dragged_images = []
+        self.dragged_videos = []
 
         # Setup drag-and-drop UI components
         self.setup_drag_drop_ui()
@@ -90,13 +122,92 @@ class MainApp(QWidget):
         os.makedirs(self.history_folder, exist_ok=True)
         self.current_group = None
 
-        # Persistent History Window Reference
+        # Longest side of the downscaled working copies generated at ingest
+        self.proxy_sizes = PROXY_SIZES
+
+        # Incrementally maintained history statistics
+        self.stats = HistoryStats(
+            self.history_folder, os.path.join(app_directory, 'stats', f"{self.username}.json")
+        )
+
+        # Per-user settings
+        self.settings_file = os.path.join(app_directory, 'settings.json')
+        self.load_settings()
+
+        # Background prefetch of history listings and thumbnails, started after login
+        self.prefetcher = HistoryPrefetcher(self.history_folder, self.settings.get("prefetch", DEFAULT_PREFETCH_LEVEL))
+        self.prefetch_combo.setCurrentText(self.prefetcher.level)
+        self.prefetch_combo.currentTextChanged.connect(self.change_prefetch_level)
+
+        # Persistent History and Statistics Window References
         self.history_window = None
+        self.statistics_window = None
+
+        # Refresh the open views when another instance changes this history
+        self.last_changes = external_changes(self.history_folder)
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.setInterval(300)  # Coalesce bursts of writes
+        self.change_timer.timeout.connect(self.check_external_changes)
+        self.change_watcher = QFileSystemWatcher([os.path.dirname(self.history_folder)], self)
+        self.change_watcher.directoryChanged.connect(lambda _: self.change_timer.start())
+
+    def load_settings(self):
+        """Load this user's settings from file."""
+        all_settings = {}
+        if os.path.exists(self.settings_file):
+            with open(self.settings_file, 'r') as f:
+                all_settings = json.load(f)
+        self.settings = all_settings.get(self.username, {})
+
+    def save_settings(self):
+        """Save this user's settings to file, keeping settings other instances saved meanwhile."""
+        update_json(self.settings_file, lambda all_settings: all_settings.update({self.username: self.settings}))
+
+    def start_prefetch(self):
+        """Start warming the history listing and thumbnails in the background."""
+        self.prefetcher.start()
+
+    def change_prefetch_level(self, level):
+        """Apply and remember how aggressively to prefetch history."""
+        try:
+            self.prefetcher.set_level(level)
+            self.settings["prefetch"] = level
+            self.save_settings()
+            logging.info(f"Prefetch level set to: {level}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to change prefetch setting: {str(e)}")
+            logging.error(f"Exception in change_prefetch_level: {e}")
+
+    def check_external_changes(self):
+        """Reload the statistics and refresh the open views after another instance changed this history."""
+        try:
+            changes = external_changes(self.history_folder)
+            if changes == self.last_changes:
+                return
+            self.last_changes = changes
+            logging.info("History changed by another instance, refreshing.")
+            self.stats.load()
+            if self.history_window:
+                if self.history_window.isVisible():
+                    self.history_window.load_history()
+                else:
+                    self.history_window.refresh_group_windows()
+            if self.statistics_window and self.statistics_window.isVisible():
+                self.statistics_window.load_statistics()
+        except Exception as e:
+            logging.error(f"Exception in check_external_changes: {e}")
+
+    def closeEvent(self, event):
+        """Stop the background prefetch when the main window closes."""
+        self.prefetcher.stop()
+        logging.info(f"Prefetch metrics: {self.prefetcher.metrics()}")
+        super().closeEvent(event)
 
     def setup_drag_drop_ui(self):
         """Set up the UI components for drag-and-drop functionality."""
         # Label for drag-and-drop area
-        drag_drop_label = QLabel("Drag and drop images here:")
+        drag_drop_label = QLabel("Drag and drop images or videos here:")
         drag_drop_label.setStyleSheet("font-weight: bold;")
         self.layout.addWidget(drag_drop_label)
 
@@ -105,7 +216,7 @@ class MainApp(QWidget):
         drag_drop_frame.setStyleSheet("border: 2px dashed #aaa;")
         drag_drop_frame.setFixedHeight(150)
         drag_drop_layout = QVBoxLayout()
-        drag_drop_instructions = QLabel("Drag and drop your images into this area")
+        drag_drop_instructions = QLabel("Drag and drop your images or videos into this area")
         drag_drop_instructions.setAlignment(Qt.AlignmentFlag.AlignCenter)
         drag_drop_layout.addWidget(drag_drop_instructions)
         drag_drop_frame.setLayout(drag_drop_layout)
@@ -116,23 +227,24 @@ class MainApp(QWidget):
         self.layout.addWidget(self.dragged_images_list)
 
         # Button to clear the dragged images list
-        clear_dragged_button = QPushButton("Clear Dragged Images")
+        clear_dragged_button = QPushButton("Clear Dragged Files")
         clear_dragged_button.clicked.connect(self.clear_dragged_images)
         self.layout.addWidget(clear_dragged_button)
 
     def clear_dragged_images(self):
-        """Clear the list of dragged images."""
+        """Clear the list of dragged images and videos."""
         self.dragged_images.clear()
+        self.dragged_videos.clear()
         self.dragged_images_list.clear()
-        QMessageBox.information(self, "Cleared", "Dragged images list has been cleared.")
-        logging.info("Dragged images list cleared by user.")
+        QMessageBox.information(self, "Cleared", "Dragged files list has been cleared.")
+        logging.info("Dragged files list cleared by user.")
 
     def dragEnterEvent(self, event):
-        """Accept the event if it's a file with an image extension."""
+        """Accept the event if it's a file with an image or video extension."""
         if event.mimeData().hasUrls():
-            # Check if at least one of the dragged files is an image
+            # Check if at least one of the dragged files is an image or a video
             for url in event.mimeData().urls():
-                if url.toLocalFile().lower().endswith(('.png', '.jpg', '.jpeg')):
+                if url.toLocalFile().lower().endswith(('.png', '.jpg', '.jpeg') + VIDEO_EXTENSIONS):
                     event.acceptProposedAction()
                     return
         event.ignore()
@@ -141,6 +253,7 @@ class MainApp(QWidget):
         """Handle the dropped files."""
         if event.mimeData().hasUrls():
             new_images = 0
+            new_videos = 0
             for url in event.mimeData().urls():
                 file_path = url.toLocalFile()
                 if file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
@@ -149,7 +262,19 @@ class MainApp(QWidget):
                         self.dragged_images_list.addItem(file_path)
                         logging.info(f"Image dragged into app: {file_path}")
                         new_images += 1
-            if new_images > 0:
+                elif file_path.lower().endswith(VIDEO_EXTENSIONS):
+                    if file_path not in self.dragged_videos:
+                        self.dragged_videos.append(file_path)
+                        self.dragged_images_list.addItem(f"[Video] {file_path}")
+                        logging.info(f"Video dragged into app: {file_path}")
+                        new_videos += 1
+            if new_videos > 0:
+                QMessageBox.information(
+                    self, "Files Added",
+                    f"{new_images} image(s) and {new_videos} video(s) added via drag-and-drop. "
+                    "Use Video Scan to import the videos."
+                )
+            elif new_images > 0:
                 QMessageBox.information(self, "Images Added", f"{new_images} image(s) added via drag-and-drop.")
             else:
                 QMessageBox.information(self, "No New Images", "No new images were added. They might already be in the list.")
@@ -163,6 +288,8 @@ class MainApp(QWidget):
                 os.makedirs(group_path, exist_ok=True)
                 self.current_group = group_path
                 self.stop_group_button.setEnabled(True)
+                self.stats.record_group_created(group_path)
+                notify_change(self.history_folder)
                 QMessageBox.information(self, "Success", f"Group '{group_name}' created!")
                 logging.info(f"Group created: {group_path}")
 
@@ -204,36 +331,49 @@ class MainApp(QWidget):
                 progress.setValue(0)
                 self.layout.addWidget(progress)
 
-                for i, file_path in enumerate(all_images, start=1):
-                    file_name = os.path.basename(file_path)
-                    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                    new_file_name = f"{timestamp}_{file_name}"
-                    destination_path = os.path.join(target_folder, new_file_name)
-
-                    # Copy each selected file to the target directory
-                    shutil.copy(file_path, destination_path)
-                    logging.info(f"Image copied to: {destination_path}")
-
-                    # Create description file for each image
-                    desc_file = f"{destination_path}.txt"
-                    with open(desc_file, 'w') as f:
-                        f.write("Enter description here...")
-                    logging.debug(f"Description file created for: {new_file_name}")
-
-                    # Update progress
-                    progress.setValue(i)
+                # Copy images and extract their metadata in the ingest workers
+                ingested = []
+                ingested_stats = []
+                failures = []
+                start = time.perf_counter()
+                with self.prefetcher.foreground():
+                    try:
+                        for i, (destination_path, stat) in enumerate(
+                                ingest_images(all_images, target_folder, self.proxy_sizes), start=1):
+                            ingested.append(destination_path)
+                            ingested_stats.append(stat)
+                            # Update progress
+                            progress.setValue(i)
+                    except IngestError as e:
+                        failures = e.failures
+                    finally:
+                        self.stats.record_ingest(ingested, time.perf_counter() - start, ingested_stats)
+                        notify_change(self.history_folder)
 
                 # Remove the progress bar after completion
                 self.layout.removeWidget(progress)
                 progress.deleteLater()
 
-                QMessageBox.information(
-                    self, "Success", f"{len(all_images)} image(s) saved successfully!"
-                )
+                if failures:
+                    QMessageBox.warning(
+                        self, "Partially Saved",
+                        f"{len(ingested)} image(s) saved, {len(failures)} failed:\n" + "\n".join(
+                            f"{os.path.basename(file_path)}: {error}" for file_path, error in failures
+                        )
+                    )
+                else:
+                    QMessageBox.information(
+                        self, "Success", f"{len(ingested)} image(s) saved successfully!"
+                    )
 
-                # Clear dragged images after scanning
-                self.dragged_images.clear()
+                # Clear dragged images after scanning, keeping only those that failed for a retry
+                failed_paths = {file_path for file_path, _ in failures}
+                self.dragged_images = [path for path in self.dragged_images if path in failed_paths]
                 self.dragged_images_list.clear()
+                for image_path in self.dragged_images:
+                    self.dragged_images_list.addItem(image_path)
+                for video_path in self.dragged_videos:
+                    self.dragged_images_list.addItem(f"[Video] {video_path}")
 
                 # Auto-refresh history if open
                 if self.history_window:
@@ -246,11 +386,113 @@ class MainApp(QWidget):
             QMessageBox.critical(self, "Error", f"Failed during quick scan: {str(e)}")
             logging.error(f"Exception in quick_scan: {e}")
 
+    def set_importing(self, importing):
+        """
+        Disable everything that would conflict with a running video import:
+        other scans, group changes, drops and the history window's actions.
+        """
+        for button in (self.quick_scan_button, self.video_scan_button, self.create_group_button):
+            button.setEnabled(not importing)
+        self.stop_group_button.setEnabled(not importing and self.current_group is not None)
+        self.setAcceptDrops(not importing)
+        if self.history_window:
+            self.history_window.setEnabled(not importing)
+        self.history_button.setEnabled(not importing)
+
+    def video_scan(self):
+        """Import the sampled frames of one or more videos, each into a group named after the video."""
+        try:
+            file_paths, _ = QFileDialog.getOpenFileNames(
+                self, "Select Video Files", "", f"Videos ({' '.join('*' + ext for ext in VIDEO_EXTENSIONS)})"
+            )
+            all_videos = list(dict.fromkeys(file_paths + self.dragged_videos))
+            if not all_videos:
+                QMessageBox.warning(self, "Error", "No videos selected or dragged for scanning!")
+                logging.warning("Video Scan attempted with no videos selected or dragged.")
+                return
+
+            sampling_modes = [
+                f"{DEFAULT_SAMPLE_FPS:g} frame(s) per second", "2 frames per second",
+                "1 frame every 2 seconds", "On scene change"
+            ]
+            mode, ok = QInputDialog.getItem(self, "Video Scan", "Keep frames:", sampling_modes, 0, False)
+            if not ok:
+                return
+            sampling = {
+                sampling_modes[0]: {"sample_fps": DEFAULT_SAMPLE_FPS},
+                sampling_modes[1]: {"sample_fps": 2.0},
+                sampling_modes[2]: {"sample_fps": 0.5},
+                sampling_modes[3]: {"scene_change": True},
+            }[mode]
+
+            # Videos are long, so keep the window responsive while importing,
+            # including through long stretches of dropped frames
+            progress = QProgressBar()
+            self.layout.addWidget(progress)
+
+            def show_progress(frame_index, frame_count):
+                progress.setMaximum(max(frame_count, frame_index + 1))
+                progress.setValue(frame_index + 1)
+                QApplication.processEvents()
+
+            self.set_importing(True)
+            saved = 0
+            failures = []  # (video, frame name, exception)
+            with self.prefetcher.foreground():
+                try:
+                    for video_path in all_videos:
+                        progress.setValue(0)
+                        frame_paths, frame_stats = [], []
+                        start = time.perf_counter()
+                        try:
+                            for frame_path, stat, frame_index, frame_count in import_video(
+                                    video_path, self.history_folder, self.proxy_sizes,
+                                    on_progress=show_progress, **sampling):
+                                frame_paths.append(frame_path)
+                                frame_stats.append(stat)
+                        except IngestError as e:
+                            failures.extend((video_path, frame_name, error) for frame_name, error in e.failures)
+                        finally:
+                            saved += len(frame_paths)
+                            self.stats.record_ingest(frame_paths, time.perf_counter() - start, frame_stats)
+                            notify_change(self.history_folder)
+                        logging.info(f"Video imported: {video_path}")
+                finally:
+                    self.layout.removeWidget(progress)
+                    progress.deleteLater()
+                    self.set_importing(False)
+
+            if failures:
+                QMessageBox.warning(
+                    self, "Partially Saved",
+                    f"{saved} frame(s) saved from {len(all_videos)} video(s), {len(failures)} failed:\n" + "\n".join(
+                        f"{os.path.basename(video_path)} ({frame_name}): {error}"
+                        for video_path, frame_name, error in failures
+                    )
+                )
+            else:
+                QMessageBox.information(
+                    self, "Success", f"{saved} frame(s) saved from {len(all_videos)} video(s)!"
+                )
+
+            # Clear dragged videos after scanning
+            self.dragged_videos.clear()
+            self.dragged_images_list.clear()
+            for image_path in self.dragged_images:
+                self.dragged_images_list.addItem(image_path)
+
+            # Auto-refresh history if open
+            if self.history_window:
+                self.history_window.load_history()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed during video scan: {str(e)}")
+            logging.error(f"Exception in video_scan: {e}")
+
     def view_history(self):
         """Open the history window."""
         try:
             if not self.history_window:
-                self.history_window = HistoryWindow(self.history_folder)
+                self.history_window = HistoryWindow(self.history_folder, self.stats, self.prefetcher)
             self.history_window.show()
             self.history_window.raise_()
             logging.info("History window opened.")
@@ -258,10 +500,93 @@ class MainApp(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to open History window: {str(e)}")
             logging.error(f"Exception in view_history: {e}")
 
+    def view_statistics(self):
+        """Open the statistics window."""
+        try:
+            if not self.statistics_window:
+                self.statistics_window = StatisticsWindow(self.stats, self.prefetcher)
+            self.statistics_window.load_statistics()
+            self.statistics_window.show()
+            self.statistics_window.raise_()
+            logging.info("Statistics window opened.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open Statistics window: {str(e)}")
+            logging.error(f"Exception in view_statistics: {e}")
+
+def describe_metadata(metadata):
+    """Return a one-line summary of the capture time, camera and location of a scan."""
+    parts = []
+    if metadata["capture_time"]:
+        parts.append(f"Captured {metadata['capture_time'].replace('T', ' ')}")
+    camera = " ".join(p for p in (metadata["camera_make"], metadata["camera_model"]) if p)
+    if camera:
+        parts.append(camera)
+    if metadata["gps_latitude"] is not None:
+        parts.append(f"GPS {metadata['gps_latitude']:.5f}, {metadata['gps_longitude']:.5f}")
+    return " | ".join(parts) if parts else "No capture metadata"
+
+class ScanFilterBar(QWidget):
+    """Sort and filter controls for the scans in a history view, keyed on their metadata."""
+    changed = pyqtSignal()
+
+    SORT_OPTIONS = ("Name", "Capture Time (Newest)", "Capture Time (Oldest)", "Camera")
+
+    def __init__(self):
+        super().__init__()
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        layout.addWidget(QLabel("Sort by:"))
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItems(self.SORT_OPTIONS)
+        self.sort_combo.currentIndexChanged.connect(lambda _: self.changed.emit())
+        layout.addWidget(self.sort_combo)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter by name, camera or capture date...")
+        self.filter_edit.textChanged.connect(lambda _: self.changed.emit())
+        layout.addWidget(self.filter_edit)
+
+        self.gps_only_checkbox = QCheckBox("With GPS only")
+        self.gps_only_checkbox.toggled.connect(lambda _: self.changed.emit())
+        layout.addWidget(self.gps_only_checkbox)
+
+        self.setLayout(layout)
+
+    def apply(self, scans):
+        """Filter and sort a list of (name, path, metadata) tuples."""
+        text = self.filter_edit.text().strip().lower()
+        if text:
+            scans = [
+                scan for scan in scans
+                if any(text in str(value).lower() for value in (
+                    scan[0], scan[2]["camera_make"], scan[2]["camera_model"], scan[2]["capture_time"]
+                ) if value)
+            ]
+        if self.gps_only_checkbox.isChecked():
+            scans = [scan for scan in scans if scan[2]["gps_latitude"] is not None]
+
+        sort_by = self.sort_combo.currentText()
+        if sort_by == "Name":
+            return sorted(scans, key=lambda scan: scan[0].lower())
+        if sort_by == "Camera":
+            return sorted(scans, key=lambda scan: (
+                (scan[2]["camera_make"] or "").lower(), (scan[2]["camera_model"] or "").lower(), scan[0].lower()
+            ))
+        # Capture time: scans without a capture time always go last
+        dated = sorted(
+            (scan for scan in scans if scan[2]["capture_time"]),
+            key=lambda scan: scan[2]["capture_time"],
+            reverse=sort_by == "Capture Time (Newest)"
+        )
+        return dated + [scan for scan in scans if not scan[2]["capture_time"]]
+
 class HistoryWindow(QWidget):
-    def __init__(self, history_folder):
+    def __init__(self, history_folder, stats, prefetcher):
         super().__init__()
         self.history_folder = history_folder
+        self.stats = stats
+        self.prefetcher = prefetcher
         self.setWindowTitle("History")
         self.setGeometry(350, 250, 900, 600)
 
@@ -272,8 +597,13 @@ class HistoryWindow(QWidget):
         self.scroll_layout = QVBoxLayout(self.scroll_widget)
         scroll_area.setWidget(self.scroll_widget)
 
+        # Sort and filter controls
+        self.filter_bar = ScanFilterBar()
+        self.filter_bar.changed.connect(self.load_history)
+
         # Main Layout
         layout = QVBoxLayout()
+        layout.addWidget(self.filter_bar)
         layout.addWidget(scroll_area)
         self.setLayout(layout)
 
@@ -284,28 +614,58 @@ class HistoryWindow(QWidget):
         delete_all_button = QPushButton("Delete All")
         delete_all_button.clicked.connect(self.delete_all_items)
         delete_all_layout = QHBoxLayout()
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.open_export)
+        regenerate_button = QPushButton("Regenerate Previews")
+        regenerate_button.clicked.connect(self.regenerate_previews)
         delete_all_layout.addStretch()  # Center align
+        delete_all_layout.addWidget(export_button)
+        delete_all_layout.addWidget(regenerate_button)
         delete_all_layout.addWidget(delete_all_button)
         delete_all_layout.addStretch()
         layout.addLayout(delete_all_layout)
 
     def load_history(self):
-        """Refresh the history layout."""
+        """Refresh the history layout and the rows of any open group windows."""
+        with self.prefetcher.foreground():
+            self.populate_history()
+        self.refresh_group_windows()
+
+    def refresh_group_windows(self):
+        """Bring the open group windows up to date with the files on disk."""
+        for group_window in getattr(self, 'group_windows', {}).values():
+            if group_window is not None and group_window.isVisible():
+                group_window.refresh_group_window()
+
+    def populate_history(self):
+        """
+        Rebuild the scan and group rows from the (possibly prefetched) listing.
+        Names and descriptions being edited are carried over to the new rows.
+        """
         try:
             logging.debug("Loading history...")
-            # Clear existing items
+            # Clear existing items, keeping unsaved edits
+            edits = {}
             for i in reversed(range(self.scroll_layout.count())):
                 widget = self.scroll_layout.itemAt(i).widget()
                 if widget:
+                    if getattr(widget, 'file_path', None) and (
+                            widget.name_edit.isModified() or widget.desc_edit.document().isModified()):
+                        edits[widget.file_path] = widget
                     widget.setParent(None)
 
             # Individual Scans
             self.scroll_layout.addWidget(QLabel("Individual Scans:"))
-            for file in os.listdir(self.history_folder):
-                file_path = os.path.join(self.history_folder, file)
-                if os.path.isfile(file_path) and file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    self.scroll_layout.addWidget(self.create_scan_box(file, file_path))
-                    logging.debug(f"Added scan box for: {file_path}")
+            entries = self.prefetcher.listing(self.history_folder, view=True)
+            scans = [(entry.name, entry.path, entry.metadata) for entry in entries if not entry.is_dir]
+            for file, file_path, metadata in self.filter_bar.apply(scans):
+                wrapper = self.create_scan_box(file, file_path, metadata)
+                if file_path in edits:
+                    self.restore_edits(wrapper, edits.pop(file_path))
+                self.scroll_layout.addWidget(wrapper)
+                logging.debug(f"Added scan box for: {file_path}")
+            for file_path in edits:
+                logging.warning(f"Unsaved edits dropped, the scan is gone or filtered out: {file_path}")
 
             # Separator
             separator = QFrame()
@@ -315,26 +675,25 @@ class HistoryWindow(QWidget):
 
             # Groups
             self.scroll_layout.addWidget(QLabel("Groups:"))
-            for directory in os.listdir(self.history_folder):
-                group_path = os.path.join(self.history_folder, directory)
-                if os.path.isdir(group_path):
+            for entry in entries:
+                if entry.is_dir:
                     hbox = QHBoxLayout()
-                    group_button = QPushButton(directory)
-                    group_button.clicked.connect(lambda _, gp=group_path: self.open_group(gp))
+                    group_button = QPushButton(entry.name)
+                    group_button.clicked.connect(lambda _, gp=entry.path: self.open_group(gp))
                     delete_group = QPushButton("Delete")
-                    delete_group.clicked.connect(lambda _, gp=group_path: self.delete_item(gp))
+                    delete_group.clicked.connect(lambda _, gp=entry.path: self.delete_item(gp))
                     hbox.addWidget(group_button)
                     hbox.addWidget(delete_group)
 
                     wrapper = QWidget()
                     wrapper.setLayout(hbox)
                     self.scroll_layout.addWidget(wrapper)
-                    logging.debug(f"Added group box for: {group_path}")
+                    logging.debug(f"Added group box for: {entry.path}")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load history: {str(e)}")
             logging.error(f"Exception in load_history: {e}")
 
-    def create_scan_box(self, name, file_path):
+    def create_scan_box(self, name, file_path, metadata):
         """
         Creates a scan box for individual scans with editable name and description.
         """
@@ -342,23 +701,21 @@ class HistoryWindow(QWidget):
 
         # Image Thumbnail
         img_label = QLabel()
-        img_pixmap = QPixmap(file_path).scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio)
+        img_pixmap = QPixmap.fromImage(self.prefetcher.thumbnail(file_path))
         img_label.setPixmap(img_pixmap)
         box.addWidget(img_label)
 
-        # Editable Name
+        # Editable Name with the capture metadata below it
+        name_box = QVBoxLayout()
         name_edit = QLineEdit(os.path.splitext(name)[0])  # Remove extension for editing
-        box.addWidget(name_edit)
+        name_box.addWidget(name_edit)
+        name_box.addWidget(QLabel(describe_metadata(metadata)))
+        box.addLayout(name_box)
 
-        # Editable Description
+        # Editable Description, remembering what was loaded to detect edits made by other instances
         desc_edit = QTextEdit()
-        desc_file = f"{file_path}.txt"
-        if os.path.exists(desc_file):
-            with open(desc_file, 'r') as f:
-                desc_content = f.read()
-                desc_edit.setPlainText(desc_content)
-        else:
-            desc_edit.setPlainText("Enter description here...")
+        desc_edit.loaded_description = read_description(file_path)
+        desc_edit.setPlainText(desc_edit.loaded_description or "Enter description here...")
         box.addWidget(desc_edit)
 
         # Save Button
@@ -376,10 +733,27 @@ class HistoryWindow(QWidget):
         )
         box.addWidget(delete_button)
 
-        # Wrap
+        # Wrap, remembering the scan and its fields so a refresh can keep unsaved edits
         wrapper.setLayout(box)
+        wrapper.file_path = file_path
+        wrapper.name_edit = name_edit
+        wrapper.desc_edit = desc_edit
         return wrapper
 
+    def restore_edits(self, wrapper, old_wrapper):
+        """
+        Carry unsaved edits over to a rebuilt scan box. The description keeps
+        the version it was loaded from, so saving still detects a change made
+        elsewhere in the meantime.
+        """
+        if old_wrapper.name_edit.isModified():
+            wrapper.name_edit.setText(old_wrapper.name_edit.text())
+            wrapper.name_edit.setModified(True)
+        if old_wrapper.desc_edit.document().isModified():
+            wrapper.desc_edit.setPlainText(old_wrapper.desc_edit.toPlainText())
+            wrapper.desc_edit.loaded_description = old_wrapper.desc_edit.loaded_description
+            wrapper.desc_edit.document().setModified(True)
+
     def save_changes(self, img_path, name_edit, desc_edit, wrapper):
         """Save the name and description, and update fields without refreshing the entire window."""
         try:
@@ -395,20 +769,33 @@ class HistoryWindow(QWidget):
             # Construct the new file path
             new_path = os.path.join(os.path.dirname(img_path), new_name)
 
-            # Prevent duplicate names
-            if os.path.exists(new_path) and new_path != img_path:
+            # Rename the image with its sidecars and update the description, under the folder lock
+            description = desc_edit.toPlainText()
+            try:
+                save_scan(img_path, new_path, description, desc_edit.loaded_description)
+            except FileExistsError:
+                # Prevent duplicate names
                 QMessageBox.warning(self, "Error", "A file with this name already exists!")
                 logging.warning(f"Duplicate file name attempted: {new_path}")
                 return
-
-            # Rename the image file
-            os.rename(img_path, new_path)
+            except FileNotFoundError:
+                QMessageBox.warning(self, "Warning", "The image was deleted or renamed elsewhere.")
+                logging.warning(f"Attempted to save a scan that no longer exists: {img_path}")
+                self.load_history()
+                return
+            except ScanChangedError as e:
+                # Keep the user's text; saving again overwrites the other change knowingly
+                desc_edit.loaded_description = e.description
+                QMessageBox.warning(
+                    self, "Changed Elsewhere",
+                    "This description was changed elsewhere since it was opened. Save again to overwrite it."
+                )
+                logging.warning(f"Concurrent description change detected: {img_path}")
+                return
+            desc_edit.loaded_description = description
             logging.info(f"Image renamed from {img_path} to {new_path}")
-
-            # Update the description file
-            desc_file = f"{new_path}.txt"
-            with open(desc_file, 'w') as f:
-                f.write(desc_edit.toPlainText())
+            self.stats.record_renamed(img_path, new_path)
+            notify_change(self.history_folder)
             logging.debug(f"Description file updated for: {new_path}")
 
             # Show success message without closing the window
@@ -418,15 +805,22 @@ class HistoryWindow(QWidget):
             # Update UI fields dynamically without refreshing
             name_edit.setText(os.path.splitext(new_name)[0])  # Update name without extension
             desc_edit.setPlainText(desc_edit.toPlainText())
+            desc_edit.document().setModified(False)
 
-            # **Reconnect the Delete Button with the New Path**
+            # **Reconnect the Save and Delete Buttons with the New Path**
             if wrapper:
-                # Find the Delete button within the wrapper
+                wrapper.file_path = new_path
+
+                # Find the buttons within the wrapper
                 delete_button = None
                 for child in wrapper.findChildren(QPushButton):
                     if child.text() == "Delete":
                         delete_button = child
-                        break
+                    elif child.text() == "Save":
+                        child.clicked.disconnect()
+                        child.clicked.connect(
+                            lambda _, ip=new_path, ne=name_edit, de=desc_edit, wr=wrapper: self.save_changes(ip, ne, de, wr)
+                        )
 
                 if delete_button:
                     # Disconnect the old lambda
@@ -449,15 +843,32 @@ class HistoryWindow(QWidget):
         try:
             logging.debug(f"Attempting to delete: {path}")
             if os.path.isdir(path):
-                shutil.rmtree(path)
+                try:
+                    # Under the history folder lock, so no scan is being added to the group meanwhile
+                    delete_group(path)
+                except FileNotFoundError:
+                    QMessageBox.warning(self, "Warning", "The selected item does not exist.")
+                    logging.warning(f"Attempted to delete non-existent item: {path}")
+                    self.load_history()
+                    return
                 logging.info(f"Group deleted: {path}")
-            elif os.path.isfile(path):
-                os.remove(path)
-                logging.info(f"File deleted: {path}")
+                self.stats.record_group_removed(path)
+                group_window = getattr(self, 'group_windows', {}).pop(path, None)
+                if group_window is not None:
+                    group_window.hide()
+                    group_window.deleteLater()
             else:
-                QMessageBox.warning(self, "Warning", "The selected item does not exist.")
-                logging.warning(f"Attempted to delete non-existent item: {path}")
-                return
+                try:
+                    # Removes the sidecars and proxies too, under the folder lock
+                    stat = delete_scan(path)
+                except FileNotFoundError:
+                    QMessageBox.warning(self, "Warning", "The selected item does not exist.")
+                    logging.warning(f"Attempted to delete non-existent item: {path}")
+                    self.load_history()
+                    return
+                logging.info(f"File deleted: {path}")
+                self.stats.record_scan_removed(path, stat)
+            notify_change(self.history_folder)
 
             if wrapper:
                 wrapper.setParent(None)
@@ -477,7 +888,7 @@ class HistoryWindow(QWidget):
 
             # Check if the group already has an open window
             if group_path not in self.group_windows or self.group_windows[group_path] is None:
-                self.group_windows[group_path] = GroupWindow(group_path)
+                self.group_windows[group_path] = GroupWindow(group_path, self.stats, self.prefetcher)
                 logging.info(f"Group window created for: {group_path}")
 
             # Show the group window
@@ -504,12 +915,16 @@ class HistoryWindow(QWidget):
             )
 
             if reply == QMessageBox.StandardButton.Yes:
-                # Delete all items in the history folder
-                for root, dirs, files in os.walk(self.history_folder, topdown=False):
-                    for file in files:
-                        os.remove(os.path.join(root, file))
-                    for directory in dirs:
-                        shutil.rmtree(os.path.join(root, directory))
+                # Delete all items in the history folder, keeping its lock file
+                with folder_lock(self.history_folder):
+                    for file in os.listdir(self.history_folder):
+                        path = os.path.join(self.history_folder, file)
+                        if os.path.isdir(path):
+                            shutil.rmtree(path)
+                        elif file != LOCK_FILE_NAME:
+                            os.remove(path)
+                self.stats.record_cleared()
+                notify_change(self.history_folder)
 
                 # Reload the UI after deleting all files
                 self.load_history()
@@ -521,6 +936,30 @@ class HistoryWindow(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to delete all items: {str(e)}")
             logging.error(f"Exception in delete_all_items: {e}")
 
+    def open_export(self):
+        """Open the export window for this history."""
+        try:
+            if not hasattr(self, 'export_window'):
+                self.export_window = ExportWindow(self.history_folder, self.prefetcher)
+            self.export_window.load_groups()
+            self.export_window.show()
+            self.export_window.raise_()
+            logging.info("Export window opened.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open Export window: {str(e)}")
+            logging.error(f"Exception in open_export: {e}")
+
+    def regenerate_previews(self):
+        """Rebuild the downscaled working copies of every scan and drop stale ones."""
+        try:
+            count = sum(1 for _ in regenerate_proxies(self.history_folder))
+            self.load_history()
+            QMessageBox.information(self, "Previews", f"Previews regenerated for {count} image(s).")
+            logging.info(f"Proxies regenerated for {count} image(s) in {self.history_folder}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to regenerate previews: {str(e)}")
+            logging.error(f"Exception in regenerate_previews: {e}")
+
     def hide_group_window(self, group_path):
         """Hide the group window instead of closing it."""
         try:
@@ -531,10 +970,213 @@ class HistoryWindow(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to hide group window: {str(e)}")
             logging.error(f"Exception in hide_group_window: {e}")
 
+class GroupScanRow:
+    """One scan of a group, with its description and thumbnail loaded on demand."""
+
+    def __init__(self, entry):
+        self.update(entry)
+
+    def update(self, entry):
+        """Take over a newer listing entry, dropping anything loaded from the old file."""
+        self.name = entry.name
+        self.path = entry.path
+        self.mtime_ns = entry.mtime_ns
+        self.metadata = entry.metadata
+        self.release()
+
+    def release(self):
+        """Forget the loaded description and thumbnail; they are reloaded when needed."""
+        self.description = None
+        self.thumbnail = None
+        self.thumbnail_pending = False
+
+    def load_description(self):
+        if self.description is None:
+            self.description = ""
+            desc_file = f"{self.path}.txt"
+            if os.path.exists(desc_file):
+                with open(desc_file, 'r') as f:
+                    self.description = f.read()
+        return self.description
+
+    def description_changed(self):
+        """Re-read a loaded description. Returns True if it changed on disk."""
+        if self.description is None:
+            return False
+        old_description = self.description
+        self.description = None
+        return self.load_description() != old_description
+
+class GroupScanModel(QAbstractTableModel):
+    """
+    Paged table of the scans in a group. Rows are handed to the view a page at
+    a time as it scrolls, and thumbnails are requested only for the rows the
+    view actually paints; the group window loads them in the background.
+    """
+    thumbnail_requested = pyqtSignal(str)
+
+    PAGE_SIZE = 50
+    COLUMNS = ("Scan", "Name", "Description", "Details")
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []  # GroupScanRow in display order
+        self.loaded = 0  # Number of rows handed to the view so far
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < len(self.rows)
+
+    def fetchMore(self, parent):
+        count = min(self.PAGE_SIZE, len(self.rows) - self.loaded)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == 0 and role == Qt.ItemDataRole.DecorationRole:
+            if row.thumbnail is None and not row.thumbnail_pending:
+                row.thumbnail_pending = True
+                self.thumbnail_requested.emit(row.path)
+            return row.thumbnail
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 1:
+                return os.path.splitext(row.name)[0]
+            if column == 2:
+                return row.load_description()
+            if column == 3:
+                return describe_metadata(row.metadata)
+        if role == Qt.ItemDataRole.ToolTipRole and column == 2:
+            return row.load_description()
+        return None
+
+    def set_rows(self, rows, loaded=0):
+        """Replace all rows, handing at least the first page to the view."""
+        self.beginResetModel()
+        self.rows = rows
+        self.loaded = min(max(self.PAGE_SIZE, loaded), len(rows))
+        self.endResetModel()
+
+    def merge(self, entries):
+        """
+        Bring the rows in line with a new listing, given in display order: drop
+        the scans that are gone, update the ones that changed on disk and insert
+        new ones where they sort. Rows that did not change keep their loaded
+        thumbnail and description. Rows moved by the changes are reordered in
+        place, so the selection follows them.
+        """
+        wanted = {entry.path: entry for entry in entries}
+        for i in reversed(range(len(self.rows))):
+            row = self.rows[i]
+            entry = wanted.pop(row.path, None)
+            if entry is None:
+                self.remove_row(i)
+            elif entry.mtime_ns != row.mtime_ns or entry.metadata != row.metadata:
+                row.update(entry)
+                self.row_changed(i)
+            elif row.description_changed():
+                self.row_changed(i)
+
+        kept = [entry.path for entry in entries if entry.path not in wanted]
+        if kept != [row.path for row in self.rows]:
+            self.reorder(kept)
+        for i, entry in enumerate(entries):
+            if entry.path in wanted:
+                self.insert_row(i, GroupScanRow(entry))
+
+    def reorder(self, paths):
+        """Put the rows in the order of paths, moving persistent indexes (and so the selection) along."""
+        self.layoutAboutToBeChanged.emit()
+        old_paths = [row.path for row in self.rows]
+        rows = {row.path: row for row in self.rows}
+        self.rows = [rows[path] for path in paths]
+        positions = {path: i for i, path in enumerate(paths)}
+        for index in self.persistentIndexList():
+            i = positions[old_paths[index.row()]]
+            # A row moved past the loaded pages is no longer in the view
+            self.changePersistentIndex(
+                index, self.createIndex(i, index.column()) if i < self.loaded else QModelIndex()
+            )
+        self.layoutChanged.emit()
+
+    def row_of(self, path):
+        for i, row in enumerate(self.rows):
+            if row.path == path:
+                return i
+        return -1
+
+    def row_changed(self, i):
+        if i < self.loaded:
+            self.dataChanged.emit(self.index(i, 0), self.index(i, len(self.COLUMNS) - 1))
+
+    def remove_row(self, i):
+        if i < self.loaded:
+            self.beginRemoveRows(QModelIndex(), i, i)
+            del self.rows[i]
+            self.loaded -= 1
+            self.endRemoveRows()
+        else:
+            del self.rows[i]
+
+    def insert_row(self, i, row):
+        # Rows past the loaded pages are handed to the view by fetchMore
+        if i > self.loaded or (i == self.loaded and self.loaded < len(self.rows)):
+            self.rows.insert(i, row)
+            return
+        self.beginInsertRows(QModelIndex(), i, i)
+        self.rows.insert(i, row)
+        self.loaded += 1
+        self.endInsertRows()
+
+    def set_thumbnail(self, path, pixmap):
+        i = self.row_of(path)
+        if i < 0:
+            return
+        self.rows[i].thumbnail = pixmap
+        self.rows[i].thumbnail_pending = False
+        if i < self.loaded:
+            self.dataChanged.emit(self.index(i, 0), self.index(i, 0), [Qt.ItemDataRole.DecorationRole])
+
+    def release(self):
+        """Drop every loaded thumbnail and description."""
+        for row in self.rows:
+            row.release()
+
 class GroupWindow(QWidget):
-    def __init__(self, group_path):
+    # Results of the background work, delivered on the GUI thread
+    listed = pyqtSignal(int, object)
+    thumbnail_loaded = pyqtSignal(int, str, QImage)
+
+    # Shared by all group windows, so that listing and decoding never block the GUI
+    loader_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="GroupWindow")
+
+    def __init__(self, group_path, stats, prefetcher):
         super().__init__()
         self.group_path = group_path
+        self.stats = stats
+        self.prefetcher = prefetcher
+        self.entries = {}  # path -> HistoryEntry of the latest listing
+        self.list_generation = 0  # Bumped by every refresh, so stale listings are ignored
+        self.thumbnail_generation = 0  # Bumped on release, so late thumbnails are ignored
+        self.released = False
+        self.editor_path = None  # Scan shown in the editor
+        self.editor_description = None  # Its description as loaded, to detect edits made elsewhere
         self.setWindowTitle(f"Group - {os.path.basename(group_path)}")
         self.setGeometry(350, 250, 900, 600)
 
@@ -546,70 +1188,203 @@ class GroupWindow(QWidget):
         group_label.setStyleSheet("font-weight: bold; font-size: 18px;")
         layout.addWidget(group_label)
 
-        # Scroll Area
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_widget = QWidget()
-        scroll_layout = QVBoxLayout(scroll_widget)
-        scroll_area.setWidget(scroll_widget)
-
-        # Load Images in Group
-        images = [f for f in os.listdir(self.group_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        for img in images:
-            img_path = os.path.join(self.group_path, img)
-
-            # Image Layout
-            box = QHBoxLayout()
-            pixmap = QPixmap(img_path).scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio)
-            img_label = QLabel()
-            img_label.setPixmap(pixmap)
-
-            # Editable Name and Description
-            name_edit = QLineEdit(os.path.splitext(img)[0])  # Remove extension for editing
-            description_edit = QTextEdit()
-            desc_file = f"{img_path}.txt"
-            if os.path.exists(desc_file):
-                with open(desc_file, 'r') as f:
-                    desc_content = f.read()
-                    description_edit.setPlainText(desc_content)
+        # Sort and filter controls
+        self.filter_bar = ScanFilterBar()
+        self.filter_bar.changed.connect(self.apply_filter)
+        layout.addWidget(self.filter_bar)
+
+        self.status_label = QLabel("Loading...")
+        layout.addWidget(self.status_label)
+
+        # Scans, paged in by the view as it scrolls
+        self.model = GroupScanModel()
+        self.model.thumbnail_requested.connect(self.load_thumbnail)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.table.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE + 4)
+        self.table.verticalHeader().hide()
+        self.table.setColumnWidth(0, THUMBNAIL_SIZE + 8)
+        self.table.setColumnWidth(1, 200)
+        self.table.setColumnWidth(2, 300)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.selectionModel().currentRowChanged.connect(self.sync_editor)
+        layout.addWidget(self.table)
+
+        # Editor for the selected scan
+        editor = QHBoxLayout()
+        self.name_edit = QLineEdit()
+        self.description_edit = QTextEdit()
+        self.description_edit.setPlaceholderText("Enter description here...")
+        self.description_edit.setMaximumHeight(80)
+        self.save_button = QPushButton("Save")
+        self.save_button.clicked.connect(self.save_changes)
+        self.delete_button = QPushButton("Delete")
+        self.delete_button.clicked.connect(self.delete_item)
+        editor.addWidget(self.name_edit)
+        editor.addWidget(self.description_edit)
+        editor.addWidget(self.save_button)
+        editor.addWidget(self.delete_button)
+        layout.addLayout(editor)
+        self.setLayout(layout)
+        self.show_selected()
+
+        # List the group in the background; the window shows right away
+        self.listed.connect(self.apply_listing)
+        self.thumbnail_loaded.connect(self.set_thumbnail)
+        self.refresh_group_window()
+
+    def refresh_group_window(self):
+        """Re-list the group in the background. Only the rows that changed are updated."""
+        try:
+            self.list_generation += 1
+            self.loader_pool.submit(self.list_in_background, self.list_generation)
+            logging.debug(f"Refreshing group window: {self.group_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to refresh group window: {str(e)}")
+            logging.error(f"Exception in refresh_group_window: {e}")
+
+    def list_in_background(self, generation):
+        """Runs on a loader thread."""
+        try:
+            with self.prefetcher.foreground():
+                try:
+                    entries = self.prefetcher.listing(self.group_path, view=True)
+                except FileNotFoundError:
+                    entries = []  # The group was deleted
+            self.listed.emit(generation, entries)
+        except Exception as e:
+            logging.error(f"Exception in list_in_background: {e}")
+
+    def apply_listing(self, generation, entries):
+        """Merge a finished listing into the view."""
+        if generation != self.list_generation:
+            return
+        try:
+            self.entries = {entry.path: entry for entry in entries if not entry.is_dir}
+            if self.model.rows:
+                self.model.merge(self.visible_entries())
+                if self.selected_row() < 0:
+                    self.select_path(self.editor_path)  # Moved past the loaded pages
             else:
-                description_edit.setPlainText("Enter description here...")
-
-            # Save Button
-            save_button = QPushButton("Save")
-            # IMPORTANT: Pass the actual wrapper below instead of `w=None`
-            wrapper = QWidget()
-            save_button.clicked.connect(
-                lambda _, ip=img_path, ne=name_edit, de=description_edit, wr=wrapper: self.save_changes(ip, ne, de, wr)
-            )
+                self.model.set_rows([GroupScanRow(entry) for entry in self.visible_entries()])
+            self.update_status()
+            self.sync_editor()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load group: {str(e)}")
+            logging.error(f"Exception in apply_listing: {e}")
 
-            # Delete Button
-            delete_button = QPushButton("Delete")
-            # Connect the Delete button to the old path initially
-            delete_button.clicked.connect(
-                lambda _, ip=img_path, w=wrapper: self.delete_item(ip, w)
-            )
+    def visible_entries(self):
+        """The listed scans that pass the filter bar, in its order."""
+        scans = [(entry.name, entry.path, entry.metadata) for entry in self.entries.values()]
+        return [self.entries[path] for _, path, _ in self.filter_bar.apply(scans)]
 
-            # Add to Layout
-            box.addWidget(img_label)
-            box.addWidget(name_edit)
-            box.addWidget(description_edit)
-            box.addWidget(save_button)
-            box.addWidget(delete_button)
+    def apply_filter(self):
+        """Re-sort and re-filter the rows, keeping whatever they already loaded."""
+        try:
+            rows = {row.path: row for row in self.model.rows}
+            self.model.set_rows([rows.get(entry.path) or GroupScanRow(entry) for entry in self.visible_entries()])
+            self.select_path(self.editor_path)
+            self.update_status()
+            self.sync_editor()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to filter group: {str(e)}")
+            logging.error(f"Exception in apply_filter: {e}")
 
-            # Wrap
-            wrapper.setLayout(box)
-            scroll_layout.addWidget(wrapper)
+    def update_status(self):
+        shown, total = len(self.model.rows), len(self.entries)
+        self.status_label.setText(f"{total} scan(s)" if shown == total else f"{shown} of {total} scan(s) shown")
 
-        layout.addWidget(scroll_area)
-        self.setLayout(layout)
+    def load_thumbnail(self, path):
+        """Decode the thumbnail of a row the view is about to show."""
+        self.loader_pool.submit(self.thumbnail_in_background, self.thumbnail_generation, path)
 
-    def save_changes(self, img_path, name_edit, desc_edit, wrapper):
-        """Save the name and description, and update fields without refreshing the entire window."""
+    def thumbnail_in_background(self, generation, path):
+        """Runs on a loader thread."""
+        if generation != self.thumbnail_generation:
+            return
+        try:
+            with self.prefetcher.foreground():
+                image = self.prefetcher.thumbnail(path)
+            self.thumbnail_loaded.emit(generation, path, image)
+        except Exception as e:
+            logging.error(f"Exception in thumbnail_in_background: {e}")
+
+    def set_thumbnail(self, generation, path, image):
+        if generation == self.thumbnail_generation:
+            self.model.set_thumbnail(path, QPixmap.fromImage(image))
+
+    def release_resources(self):
+        """Drop thumbnails and descriptions while the window is hidden."""
+        self.thumbnail_generation += 1
+        self.model.release()
+        self.released = True
+        logging.debug(f"Group window released: {self.group_path}")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.released:
+            self.released = False
+            self.refresh_group_window()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # Minimizing hides the window too; keep everything loaded then
+        if not event.spontaneous():
+            self.release_resources()
+
+    def selected_row(self):
+        """Return the index of the selected row, or -1."""
+        index = self.table.selectionModel().currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def show_selected(self, *_):
+        """Fill the editor from the selected scan."""
+        i = self.selected_row()
+        if i < 0:
+            self.editor_path = self.editor_description = None
+            self.name_edit.clear()
+            self.description_edit.clear()
+        else:
+            row = self.model.rows[i]
+            self.editor_path, self.editor_description = row.path, row.load_description()
+            self.name_edit.setText(os.path.splitext(row.name)[0])  # Remove extension for editing
+            self.description_edit.setPlainText(self.editor_description)
+        for widget in (self.name_edit, self.description_edit, self.save_button, self.delete_button):
+            widget.setEnabled(i >= 0)
+
+    def select_path(self, path):
+        """Select the row of a scan, if it is still shown, paging it into the view if needed."""
+        i = self.model.row_of(path) if path else -1
+        if i < 0:
+            return
+        while i >= self.model.loaded:
+            self.model.fetchMore(QModelIndex())
+        self.table.selectionModel().setCurrentIndex(
+            self.model.index(i, 0),
+            QItemSelectionModel.SelectionFlag.ClearAndSelect | QItemSelectionModel.SelectionFlag.Rows
+        )
+
+    def sync_editor(self, *_):
+        """Reload the editor only if the selected scan changed, so a refresh does not discard typing."""
+        i = self.selected_row()
+        if (self.model.rows[i].path if i >= 0 else None) != self.editor_path:
+            self.show_selected()
+
+    def save_changes(self):
+        """Save the name and description of the selected scan, updating only its row."""
         try:
+            i = self.selected_row()
+            if i < 0:
+                return
+            row = self.model.rows[i]
+            img_path = row.path
             logging.debug(f"Saving changes for: {img_path}")
             # Get the new name and ensure the correct file extension
-            new_name = name_edit.text().strip()
+            new_name = self.name_edit.text().strip()
 
             # Preserve file extension
             original_extension = os.path.splitext(img_path)[-1]
@@ -619,78 +1394,75 @@ class GroupWindow(QWidget):
             # Construct the new file path
             new_path = os.path.join(os.path.dirname(img_path), new_name)
 
-            # Prevent duplicate names
-            if os.path.exists(new_path) and new_path != img_path:
+            # Rename the image with its sidecars and update the description, under the folder lock
+            description = self.description_edit.toPlainText()
+            try:
+                save_scan(img_path, new_path, description, self.editor_description)
+            except FileExistsError:
+                # Prevent duplicate names
                 QMessageBox.warning(self, "Error", "A file with this name already exists!")
                 logging.warning(f"Duplicate file name attempted: {new_path}")
                 return
-
-            # Rename the image file
-            os.rename(img_path, new_path)
+            except FileNotFoundError:
+                QMessageBox.warning(self, "Warning", "The image was deleted or renamed elsewhere.")
+                logging.warning(f"Attempted to save a scan that no longer exists: {img_path}")
+                self.refresh_group_window()
+                return
+            except ScanChangedError as e:
+                # Keep the user's text; saving again overwrites the other change knowingly
+                self.editor_description = e.description
+                QMessageBox.warning(
+                    self, "Changed Elsewhere",
+                    "This description was changed elsewhere since it was opened. Save again to overwrite it."
+                )
+                logging.warning(f"Concurrent description change detected: {img_path}")
+                return
             logging.info(f"Image renamed from {img_path} to {new_path}")
-
-            # Update the description file
-            desc_file = f"{new_path}.txt"
-            with open(desc_file, 'w') as f:
-                f.write(desc_edit.toPlainText())
+            self.stats.record_renamed(img_path, new_path)
+            notify_change(os.path.dirname(self.group_path))
             logging.debug(f"Description file updated for: {new_path}")
 
+            # Update only this row
+            entry = self.entries.pop(img_path, None)
+            if entry is not None:
+                self.entries[new_path] = entry._replace(name=new_name, path=new_path)
+            row.name, row.path, row.description = new_name, new_path, description
+            self.editor_path, self.editor_description = new_path, description
+            self.model.row_changed(i)
+
             # Show success message without closing the window
             QMessageBox.information(self, "Saved", "Changes saved successfully!")
             logging.info(f"Changes saved for: {new_path}")
-
-            # Update UI fields dynamically without refreshing
-            name_edit.setText(os.path.splitext(new_name)[0])  # Update name without extension
-            desc_edit.setPlainText(desc_edit.toPlainText())
-
-            # **Reconnect the Delete Button with the New Path**
-            if wrapper:
-                # Find the Delete button within the wrapper
-                delete_button = None
-                for child in wrapper.findChildren(QPushButton):
-                    if child.text() == "Delete":
-                        delete_button = child
-                        break
-
-                if delete_button:
-                    # Disconnect the old lambda
-                    delete_button.clicked.disconnect()
-                    logging.debug("Disconnected old delete_button signal.")
-
-                    # Connect the Delete button to the new delete_item with the updated path
-                    delete_button.clicked.connect(
-                        lambda _, ip=new_path, w=wrapper: self.delete_item(ip, w)
-                    )
-                    logging.info(f"Delete button reconnected to new path: {new_path}")
-                else:
-                    logging.error("Delete button not found in wrapper after renaming.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save changes: {str(e)}")
             logging.error(f"Exception in save_changes: {e}")
 
-    def delete_item(self, img_path, wrapper=None):
-        """Delete the selected image and remove it from the UI without refreshing the whole window."""
+    def delete_item(self):
+        """Delete the selected image and remove only its row."""
         try:
+            i = self.selected_row()
+            if i < 0:
+                return
+            img_path = self.model.rows[i].path
             logging.debug(f"Attempting to delete: {img_path}")
-            # Delete the image file
-            if os.path.isfile(img_path):
-                os.remove(img_path)
-                logging.info(f"Image deleted: {img_path}")
-            else:
+            # Delete the image with its description, metadata and proxies, under the folder lock
+            try:
+                stat = delete_scan(img_path)
+            except FileNotFoundError:
                 QMessageBox.warning(self, "Warning", "The image file does not exist.")
                 logging.warning(f"Attempted to delete non-existent image: {img_path}")
+                self.refresh_group_window()
                 return
+            logging.info(f"Image deleted: {img_path}")
+            self.stats.record_scan_removed(img_path, stat)
+            notify_change(os.path.dirname(self.group_path))
 
-            # Delete the associated description file, if it exists
-            desc_file = f"{img_path}.txt"
-            if os.path.exists(desc_file):
-                os.remove(desc_file)
-                logging.debug(f"Description file deleted: {desc_file}")
-
-            # Remove only this specific widget (wrapper) from the layout
-            if wrapper:
-                wrapper.setParent(None)
-                logging.debug(f"Removed widget from UI: {img_path}")
+            # Remove only this row
+            self.entries.pop(img_path, None)
+            self.model.remove_row(i)
+            self.update_status()
+            self.show_selected()
+            logging.debug(f"Removed row from UI: {img_path}")
 
             # Show success message
             QMessageBox.information(self, "Deleted", "Image deleted successfully!")
@@ -698,31 +1470,250 @@ class GroupWindow(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to delete image: {str(e)}")
             logging.error(f"Exception in delete_item: {e}")
 
-    def refresh_group_window(self):
-        """Refresh the group window content after editing or deleting images."""
+class ExportWindow(QWidget):
+    """Export selected groups of the history to a zip/tar archive with a manifest."""
+    def __init__(self, history_folder, prefetcher):
+        super().__init__()
+        self.history_folder = history_folder
+        self.prefetcher = prefetcher
+        self.cancelled = False
+        self.setWindowTitle("Export History")
+        self.setGeometry(400, 250, 500, 500)
+
+        layout = QVBoxLayout()
+
+        # Groups to export
+        layout.addWidget(QLabel("Export:"))
+        self.groups_list = QListWidget()
+        layout.addWidget(self.groups_list)
+
+        # Manifest options
+        options = QHBoxLayout()
+        options.addWidget(QLabel("Manifest:"))
+        self.manifest_combo = QComboBox()
+        self.manifest_combo.addItems([f.upper() for f in MANIFEST_FORMATS])
+        options.addWidget(self.manifest_combo)
+        self.parquet_checkbox = QCheckBox("Also write Parquet")
+        options.addWidget(self.parquet_checkbox)
+        layout.addLayout(options)
+
+        # Progress
+        self.progress = QProgressBar()
+        layout.addWidget(self.progress)
+
+        # Buttons
+        buttons = QHBoxLayout()
+        self.export_button = QPushButton("Export...")
+        self.export_button.clicked.connect(lambda: self.run_export(resume=False))
+        buttons.addWidget(self.export_button)
+        self.resume_button = QPushButton("Resume Export...")
+        self.resume_button.clicked.connect(lambda: self.run_export(resume=True))
+        buttons.addWidget(self.resume_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_export)
+        buttons.addWidget(self.cancel_button)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    def load_groups(self):
+        """List the individual scans and every group as checkable items, all checked."""
+        self.groups_list.clear()
+        entries = self.prefetcher.listing(self.history_folder)
+        for label, group in [("Individual Scans", "")] + [(e.name, e.name) for e in entries if e.is_dir]:
+            item = QListWidgetItem(label)
+            item.setData(Qt.ItemDataRole.UserRole, group)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.groups_list.addItem(item)
+
+    def cancel_export(self):
+        """Stop the running export; it can be resumed later."""
+        self.cancelled = True
+
+    def run_export(self, resume):
+        """
+        Stream the selected groups into an archive, or continue an interrupted
+        export with the groups and manifest options it was started with.
+        """
         try:
-            logging.debug("Refreshing group window...")
-            # Clear the layout
-            layout = self.layout()
-            for i in reversed(range(layout.count())):
-                widget = layout.itemAt(i).widget()
-                if widget:
-                    widget.setParent(None)
+            settings = None
+            if resume:
+                output_path, _ = QFileDialog.getOpenFileName(
+                    self, "Resume Export", "", "Archives (*.zip *.tar)"
+                )
+                if output_path:
+                    settings = export_settings(output_path)
+                    if settings is None:
+                        QMessageBox.warning(self, "Error", "This archive has no interrupted export to resume.")
+                        return
+            else:
+                output_path, _ = QFileDialog.getSaveFileName(
+                    self, "Export History", "", "Zip archive (*.zip);;Tar archive (*.tar)"
+                )
+                if output_path and not output_path.lower().endswith(('.zip', '.tar')):
+                    output_path += ".zip"
+            if not output_path:
+                return
 
-            # Rebuild the layout
-            # (Alternatively, call __init__ again or modularize the loading process)
-            # For simplicity, reinitialize
-            self.__init__(self.group_path)
-            logging.debug("Group window refreshed.")
+            if settings:
+                groups, scans = settings["groups"], settings["scans"]
+            else:
+                groups = [
+                    self.groups_list.item(i).data(Qt.ItemDataRole.UserRole) for i in range(self.groups_list.count())
+                    if self.groups_list.item(i).checkState() == Qt.CheckState.Checked
+                ]
+                scans = None
+                if not groups:
+                    QMessageBox.warning(self, "Error", "Select at least one group to export!")
+                    return
+
+            self.progress.setMaximum(max(1, sum(1 for _ in iter_scans(self.history_folder, groups, scans))))
+            self.progress.setValue(0)
+            self.cancelled = False
+            self.export_button.setEnabled(False)
+            self.resume_button.setEnabled(False)
+            self.cancel_button.setEnabled(True)
+
+            exported = 0
+            export = export_history(
+                self.history_folder, output_path, groups, scans,
+                manifest_format=self.manifest_combo.currentText().lower(),
+                parquet=self.parquet_checkbox.isChecked(), resume=resume
+            )
+            with self.prefetcher.foreground():
+                try:
+                    for exported, _ in enumerate(export, start=1):
+                        self.progress.setValue(min(exported, self.progress.maximum()))
+                        QApplication.processEvents()
+                        if self.cancelled:
+                            break
+                finally:
+                    export.close()
+                    self.export_button.setEnabled(True)
+                    self.resume_button.setEnabled(True)
+                    self.cancel_button.setEnabled(False)
+
+            if self.cancelled:
+                QMessageBox.information(
+                    self, "Export Cancelled",
+                    f"Export stopped after {exported} scan(s). Use Resume Export to continue it."
+                )
+                logging.info(f"Export to {output_path} cancelled after {exported} scan(s).")
+            else:
+                self.progress.setValue(self.progress.maximum())
+                QMessageBox.information(self, "Exported", f"{exported} scan(s) exported to {output_path}.")
+                logging.info(f"History exported to: {output_path}")
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to refresh group window: {str(e)}")
-            logging.error(f"Exception in refresh_group_window: {e}")
+            QMessageBox.critical(self, "Error", f"Failed to export history: {str(e)}")
+            logging.error(f"Exception in run_export: {e}")
+
+class StatisticsWindow(QWidget):
+    """Scan counts per group and day, storage used and ingest throughput, read from the maintained aggregates."""
+    def __init__(self, stats, prefetcher):
+        super().__init__()
+        self.stats = stats
+        self.prefetcher = prefetcher
+        self.setWindowTitle("Statistics")
+        self.setGeometry(400, 250, 700, 600)
+
+        layout = QVBoxLayout()
+
+        # Totals
+        self.totals_label = QLabel()
+        self.totals_label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        layout.addWidget(self.totals_label)
+
+        # Scans per group
+        layout.addWidget(QLabel("Scans per Group:"))
+        self.groups_table = QTableWidget(0, 3)
+        self.groups_table.setHorizontalHeaderLabels(["Group", "Scans", "Storage"])
+        layout.addWidget(self.groups_table)
+
+        # Scans per day
+        layout.addWidget(QLabel("Scans per Day:"))
+        self.days_table = QTableWidget(0, 2)
+        self.days_table.setHorizontalHeaderLabels(["Day", "Scans"])
+        layout.addWidget(self.days_table)
+
+        # Ingest throughput
+        layout.addWidget(QLabel("Ingest Throughput:"))
+        self.ingests_table = QTableWidget(0, 4)
+        self.ingests_table.setHorizontalHeaderLabels(["Time", "Scans", "Size", "Scans/s"])
+        layout.addWidget(self.ingests_table)
+
+        # Prefetch metrics
+        self.prefetch_label = QLabel()
+        layout.addWidget(self.prefetch_label)
+
+        # Rebuild Button
+        rebuild_button = QPushButton("Rebuild from Disk")
+        rebuild_button.clicked.connect(self.rebuild_statistics)
+        layout.addWidget(rebuild_button)
+
+        self.setLayout(layout)
+
+    @staticmethod
+    def format_size(size):
+        """Format a byte count for display."""
+        for unit in ("B", "KB", "MB", "GB"):
+            if abs(size) < 1024:
+                return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+            size /= 1024
+        return f"{size:.1f} TB"
+
+    @staticmethod
+    def fill_table(table, rows):
+        """Replace the rows of a table."""
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+
+    def load_statistics(self):
+        """Refresh the tables from the aggregates."""
+        try:
+            self.totals_label.setText(
+                f"{self.stats.total_count()} scan(s) in {len(self.stats.groups) - 1} group(s), "
+                f"{self.format_size(self.stats.total_bytes())} of images"
+            )
+            self.fill_table(self.groups_table, [
+                (group or "(Individual scans)", entry["count"], self.format_size(entry["bytes"]))
+                for group, entry in sorted(self.stats.groups.items())
+            ])
+            self.fill_table(self.days_table, sorted(self.stats.counts_by_day().items(), reverse=True))
+            self.fill_table(self.ingests_table, [
+                (when.replace("T", " "), count, self.format_size(size), f"{count / seconds:.1f}" if seconds else "-")
+                for when, count, size, seconds in reversed(self.stats.ingests)
+            ])
+            self.prefetch_label.setText(f"Prefetch ({self.prefetcher.level}): {self.prefetcher.metrics()}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load statistics: {str(e)}")
+            logging.error(f"Exception in load_statistics: {e}")
+
+    def rebuild_statistics(self):
+        """Recompute the statistics from the files on disk and report whether they had drifted."""
+        try:
+            drifted = self.stats.rebuild()
+            self.load_statistics()
+            if drifted:
+                QMessageBox.warning(self, "Rebuilt", "Statistics were out of date and have been corrected.")
+                logging.warning("History statistics drifted from disk and were rebuilt.")
+            else:
+                QMessageBox.information(self, "Rebuilt", "Statistics match the files on disk.")
+                logging.info("History statistics verified against disk.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to rebuild statistics: {str(e)}")
+            logging.error(f"Exception in rebuild_statistics: {e}")
 
 def main():
     app = QApplication(sys.argv)
     username = "test_user"  # Replace with actual username handling
     main_app = MainApp(username)
     main_app.show()
+    main_app.start_prefetch()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
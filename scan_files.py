@@ -0,0 +1,116 @@
+"""
+The files making up one scan (image, description, metadata and proxies),
+changed as a unit under the lock of their folder.
+
+Every check is repeated under the lock, so a rename racing a delete or an
+edit racing another instance's edit fails cleanly instead of losing data.
+Scans are changed under the locks of their folder and of its parent, and a
+whole folder is deleted under the lock of its parent, so a scan added to a
+group being deleted fails with FileNotFoundError instead of being lost.
+"""
+import itertools
+import os
+import shutil
+
+from data_lock import folder_lock, scan_folder_lock
+from scan_metadata import metadata_file_for, save_metadata
+from scan_proxies import discard_proxies, rename_proxies
+
+
+class ScanChangedError(Exception):
+    """The description was changed by someone else since it was loaded."""
+
+    def __init__(self, image_path, description):
+        super().__init__(f"The description of {os.path.basename(image_path)} was changed elsewhere")
+        self.description = description  # What is on disk now
+
+
+def description_file_for(image_path):
+    return f"{image_path}.txt"
+
+
+def read_description(image_path):
+    """Return the description of a scan, or "" if it has none."""
+    try:
+        with open(description_file_for(image_path), 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def add_scan(folder, file_name, image_path, description, metadata):
+    """
+    Move a fully written image into folder as a new scan, with its description
+    and metadata, in one step under the folder lock, so other instances never
+    see a half-ingested scan. Clashing names (e.g. the same photo ingested by
+    two instances in the same second) get a numeric suffix.
+    Returns the path of the new scan and its stat, taken before any other
+    instance can change it.
+    """
+    stem, extension = os.path.splitext(file_name)
+    with scan_folder_lock(folder):
+        for n in itertools.count(1):
+            path = os.path.join(folder, file_name if n == 1 else f"{stem}_{n}{extension}")
+            if not os.path.exists(path):
+                break
+        os.replace(image_path, path)
+        with open(description_file_for(path), 'w') as f:
+            f.write(description)
+        save_metadata(path, metadata)
+        return path, os.stat(path)
+
+
+def save_scan(image_path, new_path, description, loaded_description=None):
+    """
+    Rename a scan with its sidecars and proxies and write its description.
+    Raises FileNotFoundError if the scan was deleted, FileExistsError if
+    new_path is taken, and ScanChangedError if loaded_description is given
+    and no longer matches the description on disk.
+    """
+    with scan_folder_lock(os.path.dirname(image_path)):
+        if not os.path.isfile(image_path):
+            raise FileNotFoundError(f"The scan no longer exists: {image_path}")
+        if loaded_description is not None:
+            current = read_description(image_path)
+            if current != loaded_description:
+                raise ScanChangedError(image_path, current)
+        if new_path != image_path:
+            if os.path.exists(new_path):
+                raise FileExistsError(f"A file with this name already exists: {new_path}")
+            os.rename(image_path, new_path)
+            for old_sidecar, new_sidecar in (
+                    (metadata_file_for(image_path), metadata_file_for(new_path)),
+                    (description_file_for(image_path), description_file_for(new_path))):
+                if os.path.exists(old_sidecar):
+                    os.replace(old_sidecar, new_sidecar)
+            rename_proxies(image_path, new_path)
+
+        desc_file = description_file_for(new_path)
+        temp_file = f"{desc_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as f:
+            f.write(description)
+        os.replace(temp_file, desc_file)
+
+
+def delete_scan(image_path):
+    """
+    Delete a scan with its sidecars and proxies. Returns the stat of the image
+    taken just before deletion. Raises FileNotFoundError if it is already gone.
+    """
+    with scan_folder_lock(os.path.dirname(image_path)):
+        stat = os.stat(image_path)
+        os.remove(image_path)
+        for sidecar in (description_file_for(image_path), metadata_file_for(image_path)):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+        discard_proxies(image_path)
+    return stat
+
+
+def delete_group(group_path):
+    """
+    Delete a group with all its scans, under the lock of the history folder
+    holding it, which every change to its scans takes first.
+    """
+    with folder_lock(os.path.dirname(os.path.abspath(group_path))):
+        shutil.rmtree(group_path)
@@ -0,0 +1,301 @@
+"""
+Header-only metadata extraction for scanned images.
+
+Only the image headers are parsed (EXIF/XMP segments for JPEG, IHDR, text and
+eXIf chunks for PNG). Pixel data is never read or decoded, so extraction costs
+a handful of small reads per file.
+"""
+import datetime
+import email.utils
+import json
+import logging
+import os
+import re
+import struct
+import zlib
+
+# Fields stored with every scan (in "<image>.json" next to the image)
+METADATA_FIELDS = (
+    "capture_time", "camera_make", "camera_model",
+    "gps_latitude", "gps_longitude", "width", "height"
+)
+
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# JPEG start-of-frame markers (SOF0..SOF15 without DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# TIFF field type -> size in bytes of one value
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+# EXIF tags
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_GPS_IFD = 0x8825
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_GPS_LATITUDE_REF = 0x0001
+_TAG_GPS_LATITUDE = 0x0002
+_TAG_GPS_LONGITUDE_REF = 0x0003
+_TAG_GPS_LONGITUDE = 0x0004
+
+_XMP_DATE_KEYS = ("exif:DateTimeOriginal", "xmp:CreateDate", "photoshop:DateCreated")
+
+
+def empty_metadata():
+    """Return a metadata dict with every field set to None."""
+    return dict.fromkeys(METADATA_FIELDS)
+
+
+def read_image_metadata(file_path):
+    """
+    Extract capture time, camera and GPS position from the image headers.
+    Fields that are missing from the file are left as None.
+    """
+    metadata = empty_metadata()
+    try:
+        with open(file_path, 'rb') as f:
+            signature = f.read(8)
+            f.seek(0)
+            if signature.startswith(b"\xff\xd8"):
+                _read_jpeg_headers(f, metadata)
+            elif signature == _PNG_SIGNATURE:
+                _read_png_headers(f, metadata)
+    except (OSError, ValueError, struct.error, zlib.error) as e:
+        logging.warning(f"Failed to read metadata from {file_path}: {e}")
+    return metadata
+
+
+def metadata_file_for(image_path):
+    """Return the path of the metadata sidecar for an image."""
+    return f"{image_path}.json"
+
+
+def save_metadata(image_path, metadata):
+    """Store the metadata next to the image."""
+    with open(metadata_file_for(image_path), 'w') as f:
+        json.dump(metadata, f)
+
+
+def load_metadata(image_path):
+    """Load the stored metadata of an image, or empty metadata if there is none."""
+    metadata = empty_metadata()
+    try:
+        with open(metadata_file_for(image_path), 'r') as f:
+            metadata.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return metadata
+
+
+def _read_jpeg_headers(f, metadata):
+    """Walk the JPEG marker segments up to the start of the scan data."""
+    f.read(2)  # SOI
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return
+        code = marker[1]
+        while code == 0xFF:  # Fill bytes
+            byte = f.read(1)
+            if not byte:
+                return
+            code = byte[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            continue  # Standalone markers have no length
+        if code in (0xD9, 0xDA):
+            return  # EOI / SOS: only entropy-coded data follows
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return
+        length = struct.unpack('>H', length_bytes)[0] - 2
+        if code == 0xE1:
+            data = f.read(length)
+            if data.startswith(b"Exif\x00\x00"):
+                _parse_exif(data[6:], metadata)
+            elif data.startswith(_XMP_HEADER):
+                _parse_xmp(data[len(_XMP_HEADER):], metadata)
+        elif code in _SOF_MARKERS:
+            data = f.read(length)
+            if len(data) >= 5:
+                metadata["height"], metadata["width"] = struct.unpack('>HH', data[1:5])
+        else:
+            f.seek(length, os.SEEK_CUR)
+
+
+def _read_png_headers(f, metadata):
+    """Walk the PNG chunks up to the first image data chunk."""
+    f.read(8)  # Signature
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b"IDAT", b"IEND"):
+            return
+        if chunk_type in (b"IHDR", b"tEXt", b"zTXt", b"iTXt", b"eXIf"):
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)  # CRC
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+            continue
+
+        if chunk_type == b"IHDR":
+            metadata["width"], metadata["height"] = struct.unpack('>II', data[:8])
+        elif chunk_type == b"eXIf":
+            _parse_exif(data, metadata)
+        else:
+            key, text = _decode_png_text(chunk_type, data)
+            if key == "XML:com.adobe.xmp":
+                _parse_xmp(text.encode('utf-8'), metadata)
+            elif key == "Creation Time" and not metadata["capture_time"]:
+                metadata["capture_time"] = _normalize_datetime(text)
+
+
+def _decode_png_text(chunk_type, data):
+    """Return (keyword, text) of a tEXt, zTXt or iTXt chunk."""
+    key, _, rest = data.partition(b"\x00")
+    key = key.decode('latin-1')
+    if chunk_type == b"tEXt":
+        return key, rest.decode('latin-1')
+    if chunk_type == b"zTXt":
+        return key, zlib.decompress(rest[1:]).decode('latin-1')
+    # iTXt: compression flag, compression method, language, translated keyword, text
+    compressed = rest[:1] == b"\x01"
+    _, _, rest = rest[2:].partition(b"\x00")
+    _, _, text = rest.partition(b"\x00")
+    if compressed:
+        text = zlib.decompress(text)
+    return key, text.decode('utf-8', 'replace')
+
+
+def _parse_exif(tiff, metadata):
+    """Read camera, capture time and GPS tags from a TIFF-structured EXIF block."""
+    if tiff[:2] == b"II":
+        endian = '<'
+    elif tiff[:2] == b"MM":
+        endian = '>'
+    else:
+        return
+    ifd0 = _read_ifd(tiff, struct.unpack_from(endian + 'I', tiff, 4)[0], endian)
+    exif_ifd = {}
+    if _TAG_EXIF_IFD in ifd0:
+        exif_ifd = _read_ifd(tiff, ifd0[_TAG_EXIF_IFD][0], endian)
+    gps_ifd = {}
+    if _TAG_GPS_IFD in ifd0:
+        gps_ifd = _read_ifd(tiff, ifd0[_TAG_GPS_IFD][0], endian)
+
+    if ifd0.get(_TAG_MAKE):
+        metadata["camera_make"] = ifd0[_TAG_MAKE]
+    if ifd0.get(_TAG_MODEL):
+        metadata["camera_model"] = ifd0[_TAG_MODEL]
+    capture_time = exif_ifd.get(_TAG_DATETIME_ORIGINAL) or ifd0.get(_TAG_DATETIME)
+    if capture_time:
+        metadata["capture_time"] = _normalize_datetime(capture_time)
+
+    latitude = _gps_coordinate(gps_ifd.get(_TAG_GPS_LATITUDE), gps_ifd.get(_TAG_GPS_LATITUDE_REF))
+    longitude = _gps_coordinate(gps_ifd.get(_TAG_GPS_LONGITUDE), gps_ifd.get(_TAG_GPS_LONGITUDE_REF))
+    if latitude is not None and longitude is not None:
+        metadata["gps_latitude"] = latitude
+        metadata["gps_longitude"] = longitude
+
+
+def _read_ifd(tiff, offset, endian):
+    """Decode the entries of one image file directory into {tag: value}."""
+    tags = {}
+    try:
+        count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, field_type, n = struct.unpack_from(endian + 'HHI', tiff, entry)
+            size = _TIFF_TYPE_SIZES.get(field_type)
+            if size is None:
+                continue
+            position = entry + 8
+            if size * n > 4:
+                position = struct.unpack_from(endian + 'I', tiff, position)[0]
+            raw = tiff[position:position + size * n]
+            if len(raw) < size * n:
+                continue
+            if field_type == 2:
+                tags[tag] = raw.split(b"\x00", 1)[0].decode('ascii', 'replace').strip()
+            elif field_type == 3:
+                tags[tag] = struct.unpack(f"{endian}{n}H", raw)
+            elif field_type in (4, 9):
+                tags[tag] = struct.unpack(f"{endian}{n}{'I' if field_type == 4 else 'i'}", raw)
+            elif field_type in (5, 10):
+                values = struct.unpack(f"{endian}{2 * n}{'I' if field_type == 5 else 'i'}", raw)
+                tags[tag] = tuple(
+                    values[k] / values[k + 1] if values[k + 1] else 0.0 for k in range(0, 2 * n, 2)
+                )
+            else:
+                tags[tag] = raw
+    except struct.error:
+        pass
+    return tags
+
+
+def _gps_coordinate(value, ref):
+    """Convert EXIF degrees/minutes/seconds and a N/S/E/W reference to signed degrees."""
+    if not value or not ref:
+        return None
+    degrees = value[0] + (value[1] if len(value) > 1 else 0) / 60 + (value[2] if len(value) > 2 else 0) / 3600
+    if ref.upper() in ("S", "W"):
+        degrees = -degrees
+    return round(degrees, 7)
+
+
+def _parse_xmp(data, metadata):
+    """Fill fields that EXIF did not provide from an XMP packet."""
+    text = data.decode('utf-8', 'replace')
+
+    def xmp_value(key):
+        match = re.search(rf'{key}\s*=\s*"([^"]*)"', text) or re.search(rf'<{key}>([^<]*)</{key}>', text)
+        return match.group(1).strip() if match else None
+
+    if not metadata["capture_time"]:
+        for key in _XMP_DATE_KEYS:
+            value = xmp_value(key)
+            if value:
+                metadata["capture_time"] = _normalize_datetime(value)
+                break
+    if not metadata["camera_make"]:
+        metadata["camera_make"] = xmp_value("tiff:Make")
+    if not metadata["camera_model"]:
+        metadata["camera_model"] = xmp_value("tiff:Model")
+    if metadata["gps_latitude"] is None:
+        latitude = _xmp_coordinate(xmp_value("exif:GPSLatitude"))
+        longitude = _xmp_coordinate(xmp_value("exif:GPSLongitude"))
+        if latitude is not None and longitude is not None:
+            metadata["gps_latitude"] = latitude
+            metadata["gps_longitude"] = longitude
+
+
+def _xmp_coordinate(value):
+    """Convert an XMP GPS coordinate ("DDD,MM,SSk" or "DDD,MM.mmk") to signed degrees."""
+    if not value or value[-1].upper() not in "NSEW":
+        return None
+    try:
+        parts = [float(p) for p in value[:-1].split(",")]
+    except ValueError:
+        return None
+    return _gps_coordinate(parts, value[-1])
+
+
+def _normalize_datetime(value):
+    """Return the capture time as an ISO 8601 string (local time, no timezone)."""
+    value = value.strip().rstrip("\x00")
+    for parse in (
+        lambda v: datetime.datetime.strptime(v[:19], "%Y:%m:%d %H:%M:%S"),
+        lambda v: datetime.datetime.fromisoformat(v.replace("Z", "+00:00")),
+        email.utils.parsedate_to_datetime,
+    ):
+        try:
+            parsed = parse(value)
+        except (ValueError, TypeError, IndexError):
+            continue
+        if parsed is not None:
+            return parsed.replace(tzinfo=None).isoformat(timespec='seconds')
+    return None
@@ -0,0 +1,228 @@
+"""
+Downscaled working copies ("proxies") of scans.
+
+Proxies are JPEGs stored in a hidden ".proxies" folder next to the originals.
+Their file names carry the size and modification time of the original, so
+a proxy stops matching as soon as the original changes and invalidation costs
+nothing. Stale proxies, and proxies whose original is gone, are removed when
+the proxy set is regenerated.
+
+Proxies are encoded outside any lock, then moved into place under the lock
+of their scan's folder, so they never outlive a scan deleted or renamed by
+another instance meanwhile.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImageReader
+
+from data_lock import scan_folder_lock
+
+PROXY_FOLDER_NAME = ".proxies"
+
+# Longest side, in pixels, of each proxy generated at ingest
+PROXY_SIZES = (128, 1024)
+PROXY_QUALITY = 85
+
+# Temporary proxy files older than this were left by a writer that crashed
+ABANDONED_TEMP_SECONDS = 3600
+
+
+def proxy_path(image_path, size, stat=None):
+    """Return the path of the proxy of the given size for the current version of an image."""
+    stat = stat or os.stat(image_path)
+    folder, name = os.path.split(image_path)
+    signature = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    return os.path.join(folder, PROXY_FOLDER_NAME, f"{name}.{size}px.{signature}.jpg")
+
+
+def generate_proxies(image_path, sizes=PROXY_SIZES):
+    """
+    Create the proxies of an image, decoding the original once at the largest
+    size needed. Sizes the original does not exceed are skipped, since the
+    original is already the smallest representation there.
+    Returns the list of proxy paths written, which is empty if the original
+    changed meanwhile. Raises FileNotFoundError if it was deleted or renamed.
+    """
+    stat = os.stat(image_path)
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    sizes = sorted(
+        (size for size in sizes if max(original_size.width(), original_size.height()) > size), reverse=True
+    )
+    if not sizes:
+        return []
+
+    # Let the decoder downscale while decoding (JPEG can skip most of the work)
+    reader.setScaledSize(original_size.scaled(sizes[0], sizes[0], Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"The scan no longer exists: {image_path}")
+        raise ValueError(f"Cannot decode {image_path}: {reader.errorString()}")
+
+    folder = os.path.dirname(image_path)
+    proxy_folder = os.path.join(folder, PROXY_FOLDER_NAME)
+    os.makedirs(proxy_folder, exist_ok=True)
+    encoded = []  # (temporary path, proxy path)
+    try:
+        for size in sizes:
+            if max(image.width(), image.height()) > size:
+                image = image.scaled(
+                    size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+                )
+            path = proxy_path(image_path, size, stat)
+            # Hidden, and unique per thread, so no other writer or cleanup ever touches it
+            temp_path = os.path.join(
+                proxy_folder, f".{os.path.basename(path)}.{os.getpid()}-{threading.get_ident()}.tmp"
+            )
+            encoded.append((temp_path, path))
+            if not image.save(temp_path, "JPEG", PROXY_QUALITY):
+                raise OSError(f"Failed to write proxy: {path}")
+
+        with scan_folder_lock(folder):
+            current = os.stat(image_path)
+            if (current.st_size, current.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                logging.debug(f"Proxies dropped, the scan changed meanwhile: {image_path}")
+                return []
+            for temp_path, path in encoded:
+                os.replace(temp_path, path)
+    finally:
+        for temp_path, _ in encoded:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    logging.debug(f"Proxies generated for: {image_path}")
+    return [path for _, path in encoded]
+
+
+def best_image_path(image_path, min_size, sizes=PROXY_SIZES):
+    """
+    Return the smallest representation of an image whose longest side is at
+    least min_size pixels: a valid proxy if there is one, else the original.
+    """
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return image_path
+    for size in sorted(sizes):
+        if size >= min_size:
+            path = proxy_path(image_path, size, stat)
+            if os.path.exists(path):
+                return path
+    return image_path
+
+
+def load_thumbnail(image_path, size):
+    """
+    Decode a thumbnail fitting in size x size pixels from the smallest
+    representation of an image. Safe to call from worker threads.
+    """
+    reader = QImageReader(best_image_path(image_path, size))
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid() and max(source_size.width(), source_size.height()) > size:
+        reader.setScaledSize(source_size.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def _proxies_of(image_path):
+    """List every proxy file (current or stale) of an image."""
+    folder, name = os.path.split(image_path)
+    proxy_folder = os.path.join(folder, PROXY_FOLDER_NAME)
+    if not os.path.isdir(proxy_folder):
+        return []
+    prefix = f"{name}."
+    return [
+        os.path.join(proxy_folder, f) for f in os.listdir(proxy_folder)
+        if f.startswith(prefix) and f[len(prefix):].split(".", 1)[0].endswith("px")
+    ]
+
+
+def discard_proxies(image_path):
+    """Delete all proxies of an image."""
+    for path in _proxies_of(image_path):
+        os.remove(path)
+
+
+def rename_proxies(old_path, new_path):
+    """Move the proxies of an image along with a rename of the original."""
+    old_name = os.path.basename(old_path)
+    new_name = os.path.basename(new_path)
+    for path in _proxies_of(old_path):
+        folder, name = os.path.split(path)
+        os.replace(path, os.path.join(folder, new_name + name[len(old_name):]))
+
+
+def _discard_orphaned_proxies(folder):
+    """
+    Delete the proxies in a folder whose original no longer exists, and
+    temporary files abandoned by crashed writers. Returns how many.
+    """
+    proxy_folder = os.path.join(folder, PROXY_FOLDER_NAME)
+    if not os.path.isdir(proxy_folder):
+        return 0
+    removed = 0
+    with scan_folder_lock(folder):
+        for f in os.listdir(proxy_folder):
+            path = os.path.join(proxy_folder, f)
+            if f.startswith("."):
+                # Being written, unless abandoned long ago
+                if f.endswith(".tmp") and time.time() - os.path.getmtime(path) > ABANDONED_TEMP_SECONDS:
+                    os.remove(path)
+                    removed += 1
+                continue
+            parts = f.rsplit(".", 3)  # name, size, signature, extension
+            if len(parts) != 4 or not parts[1].endswith("px"):
+                continue
+            if not os.path.exists(os.path.join(folder, parts[0])):
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def regenerate_proxies(history_folder, sizes=PROXY_SIZES, workers=None):
+    """
+    Rebuild the proxy set of every scan under the history folder in parallel,
+    dropping stale proxies and those of scans that no longer exist. Yields
+    each image path as it is done; scans deleted or renamed meanwhile by
+    another instance are skipped.
+    """
+    folders, images = [], []
+    for root, dirs, files in os.walk(history_folder):
+        dirs[:] = [d for d in dirs if d != PROXY_FOLDER_NAME]
+        folders.append(root)
+        images.extend(os.path.join(root, f) for f in files if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+
+    def regenerate(image_path):
+        try:
+            # Under the folder lock, so a concurrent rename cannot move proxies while they are dropped
+            with scan_folder_lock(os.path.dirname(image_path)):
+                current = {proxy_path(image_path, size) for size in sizes}
+                for path in _proxies_of(image_path):
+                    if path not in current:
+                        os.remove(path)
+            generate_proxies(image_path, sizes)
+        except FileNotFoundError:
+            logging.info(f"Skipped proxies of a scan deleted or renamed meanwhile: {image_path}")
+            return None
+        return image_path
+
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(regenerate, image_path) for image_path in images]
+        for future in as_completed(futures):
+            image_path = future.result()
+            if image_path:
+                yield image_path
+
+    for folder in folders:
+        try:
+            removed = _discard_orphaned_proxies(folder)
+        except FileNotFoundError:
+            continue  # Group deleted meanwhile
+        if removed:
+            logging.info(f"Removed {removed} orphaned proxy file(s) in {folder}")
@@ -0,0 +1,295 @@
+"""
+Stress test for several app instances sharing one data directory.
+
+Starts N processes that all work on the same user's history at once. Each
+round, every process signs up a user, ingests scans whose names clash with
+the other processes' ingests, saves descriptions (with renames) of random
+scans and deletes random scans, going through the same locked code paths as
+the app. Scans are large enough to get a proxy. Every few rounds it also imports a short video whose name, and so
+group and frame names, clash with the other processes' videos (skipped if
+OpenCV is missing). Every scan has unique pixels, so it is identified by the
+hash of its image wherever it is renamed, and every successful change is
+logged under the folder lock. Replaying the logs must reproduce the files on disk
+exactly, which shows that no write was lost. It also checks the signups, the
+statistics and the absence of orphaned sidecars and proxies, then prints
+throughput.
+Exits with a non-zero status on any failure.
+
+Usage: python stress_concurrency.py [processes] [rounds]
+"""
+import hashlib
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # Video imports are skipped
+    cv2 = None
+
+from data_lock import json_lock, notify_change, read_json, scan_folder_lock, update_json, write_json
+from history_stats import HistoryStats
+from ingest import ingest_images
+from video_scan import JPEG_QUALITY, import_video, sample_frames
+from scan_files import ScanChangedError, delete_scan, read_description, save_scan
+from scan_proxies import PROXY_FOLDER_NAME
+
+SCANS_PER_INGEST = 2
+GROUP_NAME = "field"
+DEFAULT_DESCRIPTION = "Enter description here..."
+SCAN_SIZE = 160  # Pixels, above PROXY_SIZE
+PROXY_SIZE = 128
+VIDEO_EVERY = 5  # Rounds between video imports
+VIDEO_SECONDS = 3
+
+
+def write_png(path, size=8):
+    """Write a small valid RGB PNG."""
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    rows = b"".join(b"\x00" + os.urandom(3 * size) for _ in range(size))
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows)))
+        f.write(chunk(b"IEND", b""))
+
+
+def write_video(path, seed):
+    """Write a short clip with a new sharp pattern every second."""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (160, 120))
+    try:
+        for second in range(VIDEO_SECONDS):
+            low = 64 * (second % 4)
+            blocks = rng.integers(low, low + 64, (15, 20, 3), dtype=np.uint8)
+            frame = np.kron(blocks, np.ones((8, 8, 1), dtype=np.uint8))
+            for _ in range(10):
+                writer.write(frame)
+    finally:
+        writer.release()
+
+
+def frame_ids(video_path):
+    """
+    Identify the frames an import of video_path keeps by encoding them the
+    same way, since other processes may rename or delete them right away.
+    """
+    return [
+        hashlib.sha1(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1].tobytes()).hexdigest()
+        for _, _, _, frame in sample_frames(video_path)
+    ]
+
+
+def scan_id(image_path):
+    with open(image_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def newest_scans(folder, count):
+    """The most recently added scans of a folder, skipping any deleted while listing."""
+    scans = []
+    for entry in os.scandir(folder):
+        if entry.name.endswith(".png"):
+            try:
+                scans.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:
+                pass
+    return [path for _, path in sorted(scans)[-count:]]
+
+
+def paths_of(data_dir):
+    history_folder = os.path.join(data_dir, "history", "user")
+    return (
+        history_folder,
+        os.path.join(data_dir, "user_data.json"),
+        os.path.join(data_dir, "stats", "user.json"),
+        os.path.join(data_dir, "published.json"),
+    )
+
+
+def worker(index, rounds, data_dir):
+    """One app instance. Returns its change log and operation counts."""
+    history_folder, users_file, stats_file, published_file = paths_of(data_dir)
+    stats = HistoryStats(history_folder, stats_file)
+    rng = random.Random(index)
+    # Same file name in every process, so that ingested names clash
+    sources = [os.path.join(data_dir, f"source{index}-{n}", "scan.png") for n in range(SCANS_PER_INGEST)]
+    for source in sources:
+        os.makedirs(os.path.dirname(source), exist_ok=True)
+    # Same video name in every process, so that groups and frame names clash
+    video_path = os.path.join(data_dir, f"video{index}", "walk.mp4")
+    os.makedirs(os.path.dirname(video_path), exist_ok=True)
+
+    log = []  # (timestamp, operation, scan id, description)
+    counts = {"signups": 0, "ingested": 0, "frames": 0, "saves": 0, "deletes": 0, "conflicts": 0}
+    for r in range(rounds):
+        # Sign up, as LoginSignupApp.signup does
+        with json_lock(users_file):
+            users = read_json(users_file, {})
+            users[f"user{index}-{r}"] = "password"
+            write_json(users_file, users)
+        counts["signups"] += 1
+
+        # Ingest into the history or the shared group, as MainApp.quick_scan does
+        target = history_folder if r % 2 else os.path.join(history_folder, GROUP_NAME)
+        for source in sources:
+            write_png(source, SCAN_SIZE)
+        start = time.perf_counter()
+        ingested, ingested_stats = zip(*ingest_images(sources, target, proxy_sizes=(PROXY_SIZE,)))
+        stats.record_ingest(ingested, time.perf_counter() - start, ingested_stats)
+        notify_change(history_folder)
+        log.extend((time.monotonic_ns(), "ingest", scan_id(source), DEFAULT_DESCRIPTION) for source in sources)
+        counts["ingested"] += len(ingested)
+        published = update_json(published_file, lambda data: data.update(dict.fromkeys(ingested, index)))
+
+        # Import a video now and then, as MainApp.video_scan does
+        if cv2 is not None and r % VIDEO_EVERY == 0:
+            write_video(video_path, (index, r))
+            identities = frame_ids(video_path)
+            start = time.perf_counter()
+            frames = [(path, stat) for path, stat, _, _ in import_video(video_path, history_folder, proxy_sizes=())]
+            stats.record_ingest([path for path, _ in frames], time.perf_counter() - start, [stat for _, stat in frames])
+            notify_change(history_folder)
+            assert len(frames) == len(identities), (len(frames), len(identities))
+            log.extend((time.monotonic_ns(), "ingest", identity, DEFAULT_DESCRIPTION) for identity in identities)
+            counts["frames"] += len(frames)
+            published = update_json(published_file, lambda data: data.update({path: index for path, _ in frames}))
+
+        # Save a description, often with a rename, of any published scan
+        path = rng.choice(sorted(published))
+        new_path = path
+        if rng.random() < 0.5:
+            new_path = os.path.join(os.path.dirname(path), f"w{index}-r{r}{os.path.splitext(path)[1]}")
+        description = f"Edited by {index} in round {r}"
+        try:
+            loaded = read_description(path)
+            with scan_folder_lock(os.path.dirname(path)):
+                identity = scan_id(path)
+                save_scan(path, new_path, description, loaded)
+                log.append((time.monotonic_ns(), "save", identity, description))
+            stats.record_renamed(path, new_path)
+            notify_change(history_folder)
+            counts["saves"] += 1
+        except (FileNotFoundError, FileExistsError, ScanChangedError):
+            counts["conflicts"] += 1
+
+        # Delete a scan now and then: a published one, or whatever is newest on disk, which
+        # may still be getting its proxy in another process
+        if rng.random() < 0.3:
+            candidates = sorted(published)
+            if rng.random() < 0.5:
+                folder = rng.choice([history_folder, os.path.join(history_folder, GROUP_NAME)])
+                candidates = newest_scans(folder, SCANS_PER_INGEST) or candidates
+            path = rng.choice(candidates)
+            try:
+                with scan_folder_lock(os.path.dirname(path)):
+                    identity = scan_id(path)
+                    stat = delete_scan(path)
+                    log.append((time.monotonic_ns(), "delete", identity, None))
+                stats.record_scan_removed(path, stat)
+                notify_change(history_folder)
+                counts["deletes"] += 1
+            except FileNotFoundError:
+                counts["conflicts"] += 1
+    return log, counts
+
+
+def expected_state(logs):
+    """
+    Replay the change logs of all processes. Returns {scan id: description}.
+    Saves and deletes are ordered by their timestamps, taken under the lock;
+    an ingest is logged after it returns, so it only provides the default.
+    """
+    state, deleted = {}, set()
+    for _, operation, identity, description in sorted(entry for log in logs for entry in log):
+        if operation == "ingest":
+            state.setdefault(identity, description)
+        elif operation == "save":
+            state[identity] = description
+        else:
+            deleted.add(identity)
+    return {identity: description for identity, description in state.items() if identity not in deleted}
+
+
+def disk_state(history_folder):
+    """Return {scan id: description} and the orphaned sidecars, proxies and temporary files found on disk."""
+    state, images, sidecars, proxies = {}, set(), [], []
+    for root, dirs, files in os.walk(history_folder):
+        dirs[:] = [d for d in dirs if d != PROXY_FOLDER_NAME]
+        proxy_folder = os.path.join(root, PROXY_FOLDER_NAME)
+        if os.path.isdir(proxy_folder):
+            # Proxies are named <image>.<size>px.<signature>.jpg; hidden ones are temporary
+            proxies.extend(
+                (None if f.startswith(".") else os.path.join(root, f.rsplit(".", 3)[0]), os.path.join(proxy_folder, f))
+                for f in os.listdir(proxy_folder)
+            )
+        for file in files:
+            path = os.path.join(root, file)
+            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                state[scan_id(path)] = read_description(path)
+                images.add(path)
+            elif file.endswith(('.txt', '.json', '.tmp')):
+                sidecars.append(path)
+    orphans = [path for path in sidecars if os.path.splitext(path)[0] not in images]
+    orphans.extend(path for image_path, path in proxies if image_path not in images)
+    return state, orphans
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    with tempfile.TemporaryDirectory() as data_dir:
+        history_folder, users_file, stats_file, _ = paths_of(data_dir)
+        os.makedirs(os.path.join(history_folder, GROUP_NAME))
+        HistoryStats(history_folder, stats_file)  # Created by the first instance, as in the app
+
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.starmap(worker, [(index, rounds, data_dir) for index in range(processes)])
+        elapsed = time.perf_counter() - start
+
+        logs = [log for log, _ in results]
+        counts = {key: sum(c[key] for _, c in results) for key in results[0][1]}
+        operations = counts["signups"] + counts["ingested"] + counts["frames"] + counts["saves"] + counts["deletes"]
+        print(f"{processes} process(es) x {rounds} round(s) in {elapsed:.2f} s: "
+              f"{operations / elapsed:.0f} operations/s")
+        print(", ".join(f"{count} {key}" for key, count in counts.items()))
+        if cv2 is None:
+            print("OpenCV is not installed, video imports skipped")
+
+        failures = []
+        users = read_json(users_file, {})
+        if len(users) != processes * rounds:
+            failures.append(f"{processes * rounds - len(users)} signup(s) lost")
+
+        expected = expected_state(logs)
+        on_disk, orphans = disk_state(history_folder)
+        lost = {identity for identity in expected if on_disk.get(identity) != expected[identity]}
+        extra = set(on_disk) - set(expected)
+        if lost or extra:
+            failures.append(f"{len(lost)} scan(s) lost or overwritten, {len(extra)} unexpected scan(s)")
+        if orphans:
+            failures.append(f"{len(orphans)} orphaned sidecar(s), proxies or temporary file(s)")
+
+        stats = HistoryStats(history_folder, stats_file)
+        counted = stats.total_count()
+        if stats.rebuild() or counted != len(on_disk):
+            failures.append(f"statistics counted {counted} scan(s), disk has {len(on_disk)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: no lost writes, {len(on_disk)} scan(s) on disk match the replayed changes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Video scanning: turns a walk-through video of a crop row into a group of scans.
+
+The video is decoded as a stream, one frame at a time, so memory use does not
+depend on its length. Frames between samples are only grabbed, never retrieved:
+with most backends, FFmpeg included, grab() still decodes them, but the colour
+conversion, copy and analysis are skipped, so decoding sets the pace. Kept
+frames are written by a small pool of workers while decoding continues.
+bench_video.py checks that the import keeps up with real time.
+
+Frames are added like any other scan (see scan_files.add_scan), so importing
+a video twice, or two videos with the same name, never overwrites frames.
+
+Requires OpenCV (pip install opencv-python).
+"""
+import collections
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest import INGEST_WORKERS, IngestError
+from scan_files import add_scan
+from scan_metadata import empty_metadata
+from scan_proxies import PROXY_SIZES, generate_proxies
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v')
+
+# Frames sampled per second of video in fixed-rate mode
+DEFAULT_SAMPLE_FPS = 1.0
+# Frames inspected per second of video in scene-change mode
+SCENE_ANALYSIS_FPS = 5.0
+# Histogram (Bhattacharyya) distance from the last kept frame that counts as a new scene
+SCENE_CHANGE_THRESHOLD = 0.3
+# Variance of the Laplacian below which a frame is considered blurry
+BLUR_THRESHOLD = 60.0
+# Maximum differing bits between frame hashes for a frame to count as a duplicate
+DUPLICATE_THRESHOLD = 4
+# Width frames are reduced to before the blur/duplicate/scene checks
+ANALYSIS_WIDTH = 320
+JPEG_QUALITY = 92
+
+
+def _load_cv2():
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("Video scanning requires OpenCV. Install it with: pip install opencv-python")
+    return cv2
+
+
+def _frame_hash(cv2, gray):
+    """64-bit difference hash of a grayscale frame."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return sum(1 << i for i, bit in enumerate(bits) if bit)
+
+
+def sample_frames(video_path, sample_fps=DEFAULT_SAMPLE_FPS, scene_change=False,
+                  blur_threshold=BLUR_THRESHOLD, duplicate_threshold=DUPLICATE_THRESHOLD, on_progress=None):
+    """
+    Stream the frames of a video worth keeping as scans.
+
+    Frames are sampled at sample_fps, or, with scene_change, whenever the
+    picture differs enough from the last kept frame. Blurry frames and
+    near-duplicates of the last kept frame are dropped before anything else
+    is done with them. on_progress(frame_index, frame_count), if given, is
+    called at every sampled frame, kept or not, so callers can stay responsive
+    through long stretches of dropped frames.
+
+    Yields (frame_index, frame_count, seconds, frame) for each kept frame.
+    """
+    cv2 = _load_cv2()
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, round(fps / (SCENE_ANALYSIS_FPS if scene_change else sample_fps)))
+
+        last_hash = None
+        last_histogram = None
+        index = -1
+        while capture.grab():
+            index += 1
+            if index % step:
+                continue
+            if on_progress:
+                on_progress(index, frame_count)
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+
+            height, width = frame.shape[:2]
+            gray = cv2.cvtColor(
+                cv2.resize(frame, (ANALYSIS_WIDTH, max(1, height * ANALYSIS_WIDTH // width)),
+                           interpolation=cv2.INTER_AREA),
+                cv2.COLOR_BGR2GRAY
+            )
+            if cv2.Laplacian(gray, cv2.CV_64F).var() < blur_threshold:
+                continue
+
+            frame_hash = _frame_hash(cv2, gray)
+            if last_hash is not None and bin(frame_hash ^ last_hash).count("1") <= duplicate_threshold:
+                continue
+
+            if scene_change:
+                histogram = cv2.calcHist([gray], [0], None, [64], [0, 256])
+                cv2.normalize(histogram, histogram)
+                if last_histogram is not None and cv2.compareHist(
+                        histogram, last_histogram, cv2.HISTCMP_BHATTACHARYYA) < SCENE_CHANGE_THRESHOLD:
+                    continue
+                last_histogram = histogram
+
+            last_hash = frame_hash
+            yield index, frame_count, index / fps, frame
+    finally:
+        capture.release()
+
+
+def _save_frame(cv2, frame, group_path, frame_name, video_path, seconds, proxy_sizes):
+    """
+    Write one kept frame as a scan with its description, metadata and proxies.
+    Returns the path of the frame and its stat as of when it was added.
+    """
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise OSError(f"Failed to encode frame: {frame_name}")
+
+    metadata = empty_metadata()
+    metadata["height"], metadata["width"] = frame.shape[:2]
+    metadata["source_video"] = os.path.basename(video_path)
+    metadata["video_offset"] = round(seconds, 3)
+
+    # Write under a hidden temporary name, then add it under a free name with its sidecars
+    fd, temp_path = tempfile.mkstemp(prefix=".frame-", suffix=".tmp", dir=group_path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded.tobytes())
+        frame_path, stat = add_scan(group_path, frame_name, temp_path, "Enter description here...", metadata)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    try:
+        generate_proxies(frame_path, proxy_sizes)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Failed to generate proxies for {frame_path}: {e}")
+    return frame_path, stat
+
+
+def import_video(video_path, history_folder, proxy_sizes=PROXY_SIZES, **sampling):
+    """
+    Store the kept frames of a video as scans in a group named after the video.
+    Sampling options (and on_progress) are passed to sample_frames.
+
+    Yields (frame_path, stat, frame_index, frame_count) as frames are written.
+    A frame that fails to be written does not stop the others; once all are
+    done, IngestError lists the failures. If decoding fails, the frames
+    already sampled are still written and yielded before the error is raised.
+    """
+    cv2 = _load_cv2()
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    group_path = os.path.join(history_folder, video_name)
+    os.makedirs(group_path, exist_ok=True)
+    logging.info(f"Importing video {video_path} into group: {group_path}")
+
+    # Bound the frames waiting to be written so memory stays constant
+    pending = collections.deque()
+    failures = []
+    sampling_error = None
+
+    def finish_oldest():
+        """Wait for the oldest pending frame. Returns what to yield, or None if it failed."""
+        future, frame_name, index, frame_count = pending.popleft()
+        try:
+            return (*future.result(), index, frame_count)
+        except Exception as e:
+            logging.error(f"Failed to save frame {frame_name}: {e}")
+            failures.append((frame_name, e))
+            return None
+
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        try:
+            for index, frame_count, seconds, frame in sample_frames(video_path, **sampling):
+                milliseconds = int(seconds * 1000)
+                minutes, milliseconds = divmod(milliseconds, 60000)
+                frame_name = f"{video_name}_{minutes:03d}-{milliseconds // 1000:02d}-{milliseconds % 1000:03d}.jpg"
+                pending.append((executor.submit(
+                    _save_frame, cv2, frame, group_path, frame_name, video_path, seconds, proxy_sizes
+                ), frame_name, index, frame_count))
+                if len(pending) >= 2 * INGEST_WORKERS:
+                    result = finish_oldest()
+                    if result:
+                        yield result
+        except Exception as e:
+            sampling_error = e
+        while pending:
+            result = finish_oldest()
+            if result:
+                yield result
+    if sampling_error:
+        raise sampling_error
+    if failures:
+        raise IngestError(failures)